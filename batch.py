@@ -0,0 +1,125 @@
+# Runs many .fiss scripts across a pool of worker processes.
+#
+#   python batch.py scripts/ -j 8 -o results.json
+#   python batch.py manifest.txt --engine python
+#
+# The target is a directory (searched recursively for *.fiss), a text
+# manifest with one path per line, or a JSON list of paths. Paths in a
+# manifest are relative to the manifest. Every script gets its own
+# interpreter state; stdout, errors and timing go into the results file,
+# along with the VM's usage counters. --max-steps, --max-seconds and
+# --max-memory stop a runaway script instead of hanging its worker; the
+# walker only supports --max-seconds.
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+import fission
+
+ENGINES = ("vm", "python", "walker")
+
+def find_scripts(target:str) -> list[str]:
+    if os.path.isdir(target):
+        scripts = []
+        for directory, _, files in os.walk(target):
+            scripts += [os.path.join(directory, name) for name in files if name.endswith(".fiss")]
+        return sorted(scripts)
+    base = os.path.dirname(os.path.abspath(target))
+    with open(target) as f:
+        if target.endswith(".json"):
+            paths = json.load(f)
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    return [os.path.join(base, path) for path in paths]
+
+def execute(path:str, engine:str, use_cache:bool, limits:fission.Limits, usage:dict):
+    if engine == "vm":
+        vm = fission.VirtualMachine(limits=limits)
+        result = vm.run(fission.compile_file(path,use_cache=use_cache))
+        usage.update(vm.usage.as_dict())
+        return result
+    with open(path) as f:
+        text = f.read()
+    lex = fission.Lexer(text,fast=True)
+    lex.make_tokens()
+    if engine == "python":
+        return fission.run_python(fission.Transpiler().transpile(lex.stream))
+    ASTlines = []
+    for line in lex.stream.lines():
+        parser = fission.Parser(line)
+        parser.parse()
+        ASTlines.append((parser.AST or []) + [fission.Token(fission.TT_NEWLINE,"")])
+    result = fission.Interpreter(limits).interpret(ASTlines)
+    return result if isinstance(result, fission.Error) else None
+
+def run_script(job:tuple[str, str, bool, fission.Limits]) -> dict:
+    path, engine, use_cache, limits = job
+    stdout = io.StringIO()
+    error = None
+    usage = {}
+    start = time.perf_counter()
+    # scripts can't read from the terminal in a batch, input() sees end of file
+    stdin = sys.stdin
+    sys.stdin = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(stdout):
+            try:
+                result = execute(path, engine, use_cache, limits, usage)
+            finally:
+                fission.output.flush()
+        if isinstance(result, fission.Error):
+            error = f"{result.title}: {result.body}"
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+    finally:
+        sys.stdin = stdin
+    return {"path":path, "ok":error is None, "stdout":stdout.getvalue(), "error":error,
+            "seconds":time.perf_counter() - start, "usage":usage or None}
+
+def run_batch(scripts:list[str], jobs:int | None=None, engine:str="vm", use_cache:bool=True,
+              limits:fission.Limits | None=None) -> list[dict]:
+    jobs = jobs or os.cpu_count() or 1
+    limits = limits or fission.Limits()
+    work = [(path, engine, use_cache, limits) for path in scripts]
+    if jobs == 1:
+        return [run_script(job) for job in work]
+    # thousands of tiny scripts: hand them out in chunks to keep IPC down
+    chunksize = max(1, len(work) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(run_script, work, chunksize=chunksize))
+
+def main(argv:list[str] | None=None) -> int:
+    parser = argparse.ArgumentParser(prog="python batch.py")
+    parser.add_argument("target", help="directory of .fiss files, or a manifest (text or JSON list)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("-o", "--output", default="results.json", help="results file (default results.json)")
+    parser.add_argument("--engine", choices=ENGINES, default="vm", help="how scripts are run (default vm)")
+    parser.add_argument("--no-cache", action="store_true", help="don't read or write .fissc files")
+    parser.add_argument("--max-steps", type=int, default=None, help="stop a script after this many VM instructions")
+    parser.add_argument("--max-seconds", type=float, default=None, help="stop a script after this long")
+    parser.add_argument("--max-memory", type=int, default=None, help="stop a script whose variables hold more bytes")
+    args = parser.parse_args(argv)
+    limits = fission.Limits(args.max_steps, args.max_seconds, args.max_memory)
+    if args.engine == "python" and (limits.steps, limits.seconds, limits.memory) != (None, None, None):
+        parser.error("the python engine runs unmetered, limits need --engine vm or walker")
+    if args.engine == "walker" and (limits.steps, limits.memory) != (None, None):
+        parser.error("the walker only enforces --max-seconds, --max-steps and --max-memory need --engine vm")
+
+    scripts = find_scripts(args.target)
+    start = time.perf_counter()
+    results = run_batch(scripts, args.jobs, args.engine, not args.no_cache, limits)
+    elapsed = time.perf_counter() - start
+    failed = sum(not result["ok"] for result in results)
+    summary = {"scripts":len(results), "failed":failed, "seconds":elapsed, "engine":args.engine}
+    with open(args.output, "w") as f:
+        json.dump({"summary":summary, "results":results}, f, indent=2)
+    print(f"{len(results)} scripts, {failed} failed, {elapsed:.2f}s -> {args.output}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
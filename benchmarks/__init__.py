@@ -0,0 +1,2 @@
+# Benchmark corpus and phase timing for the lexer, parser and interpreters.
+# Run with `python -m benchmarks` from the repository root.
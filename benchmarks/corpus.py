@@ -0,0 +1,55 @@
+# Generators for representative Fission programs. Each one takes a size and
+# returns (source, statements), where statements is how many statements the
+# program executes, so interpreter throughput can be reported per statement.
+
+SIZES = {"small":1_000, "medium":10_000, "large":100_000}
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+def name(index:int, prefix:str="v") -> str:
+    # identifiers can only hold letters, so spell the index in base 26
+    out = ""
+    while True:
+        out = LETTERS[index % 26] + out
+        index //= 26
+        if index == 0:
+            return prefix + out
+
+def arithmetic(size:int) -> tuple[str, int]:
+    source = "\n".join([
+        "int i = 0",
+        "int total = 0",
+        "float acc = 0.5",
+        f"while (i < {size}) {{",
+        "total = total + i * 3 - 1",
+        "acc = acc * 1.0001 + 2 / 4",
+        "i = i + 1",
+        "}",
+        "print(total)",
+    ])
+    return source, 3 + 1 + 3 * size + 1
+
+def declarations(size:int) -> tuple[str, int]:
+    lines = [f"int {name(i)} = {i} * 2 + {i % 7}" for i in range(size)]
+    return "\n".join(lines), size
+
+def strings(size:int) -> tuple[str, int]:
+    lines = []
+    for i in range(size):
+        lines.append(f"string {name(i, 's')} = \"line {i} lorem ipsum dolor sit amet consectetur\"")
+        lines.append(f"print({name(i, 's')})")
+    return "\n".join(lines), 2 * size
+
+def nested(size:int, depth:int=8) -> tuple[str, int]:
+    lines = ["int i = 0", "int hits = 0", f"while (i < {size}) {{"]
+    for level in range(depth):
+        lines.append(f"if (i >= {level}) {{")
+    lines.append("hits = hits + 1")
+    lines += ["}"] * depth
+    lines += ["i = i + 1", "}", "print(hits)"]
+    # iteration i passes the first i + 1 ifs and stops at the next one
+    ifs = sum(min(i + 2, depth) for i in range(size))
+    hits = max(size - depth + 1, 0)
+    return "\n".join(lines), 2 + 1 + ifs + hits + size + 1
+
+PROGRAMS = {"arithmetic":arithmetic, "declarations":declarations, "strings":strings, "nested":nested}
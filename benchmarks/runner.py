@@ -0,0 +1,176 @@
+# Times each phase of the pipeline over the corpus and reports throughput:
+# tokens/sec for the lexers, nodes/sec for the parsers and statements/sec
+# for the execution engines. Results can be saved as a baseline JSON and
+# later runs compared against it.
+import argparse
+import contextlib
+import io
+import json
+import signal
+import sys
+import time
+
+import fission
+from benchmarks.corpus import PROGRAMS, SIZES
+
+def best_time(function, repeat:int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+def count_parse_nodes(node) -> int:
+    if isinstance(node, list):
+        return 1 + sum(count_parse_nodes(child) for child in node)
+    return 1 if node is not None else 0
+
+def count_tree_nodes(node) -> int:
+    if isinstance(node, list):
+        return sum(count_tree_nodes(child) for child in node)
+    if isinstance(node, fission.Node):
+        return 1 + sum(count_tree_nodes(getattr(node, field)) for field in node.__slots__)
+    return 0
+
+def lex(source:str, fast:bool):
+    lexer = fission.Lexer(source,fast=fast)
+    lexer.make_tokens()
+    return lexer
+
+def parse(lines:list):
+    ASTlines = []
+    for line in lines:
+        parser = fission.Parser(line)
+        parser.parse()
+        ASTlines.append((parser.AST or []) + [fission.Token(fission.TT_NEWLINE,"")])
+    return ASTlines
+
+class TimeLimit(BaseException):
+    pass
+
+@contextlib.contextmanager
+def time_limit(seconds:float):
+    # the tree walker never terminates on some loops, so it gets an alarm;
+    # platforms without SIGALRM just run it unguarded
+    if not hasattr(signal, "SIGALRM") or not seconds:
+        yield
+        return
+    def expired(signum, frame):
+        raise TimeLimit()
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def run_walker(ASTlines:list):
+    result = fission.Interpreter().interpret(ASTlines)
+    if isinstance(result, fission.Error):
+        raise result
+
+def run_vm(code:fission.Bytecode):
+    result = fission.VirtualMachine().run(code)
+    if isinstance(result, fission.Error):
+        raise result
+
+def run_python(code):
+    namespace = fission.python_namespace()
+    exec(code, namespace)
+    namespace["fission_main"]()
+
+def measure(source:str, statements:int, repeat:int, walker_timeout:float) -> dict:
+    # phase name -> rate, or None when the phase failed on this program
+    results = {}
+    seconds, lexer = best_time(lambda: lex(source, False), repeat)
+    tokens = sum(len(line) for line in lexer.tokens)
+    results["lexer"] = tokens / seconds
+    seconds, fast_lexer = best_time(lambda: lex(source, True), repeat)
+    results["lexer-fast"] = len(fast_lexer.stream) / seconds
+
+    try:
+        seconds, ASTlines = best_time(lambda: parse(lexer.tokens), repeat)
+        results["parser"] = count_parse_nodes(ASTlines) / seconds
+    except Exception:
+        ASTlines = None
+        results["parser"] = None
+    seconds, tree = best_time(lambda: fission.Compiler().lower(fast_lexer.stream), repeat)
+    results["compiler-lower"] = count_tree_nodes(tree) / seconds
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            if ASTlines is None:
+                raise ValueError("parser failed")
+            with time_limit(walker_timeout):
+                seconds, _ = best_time(lambda: run_walker(ASTlines), repeat)
+            results["interpreter"] = statements / seconds
+        except (Exception, TimeLimit):
+            results["interpreter"] = None
+        code = fission.Compiler().compile(fast_lexer.stream)
+        seconds, _ = best_time(lambda: run_vm(code), repeat)
+        results["vm"] = statements / seconds
+        code = fission.Compiler(optimize=True).compile(fission.scan(source))
+        seconds, _ = best_time(lambda: run_vm(code), repeat)
+        results["vm-optimized"] = statements / seconds
+        python = compile(fission.Transpiler().transpile(fast_lexer.stream), "<fission>", "exec")
+        seconds, _ = best_time(lambda: run_python(python), repeat)
+        results["python"] = statements / seconds
+        fission.output.flush()
+    return results
+
+UNITS = {"lexer":"tokens/s", "lexer-fast":"tokens/s", "parser":"nodes/s", "compiler-lower":"nodes/s"}
+
+def report(results:dict, baseline:dict | None, threshold:float) -> bool:
+    regressed = False
+    for benchmark, phases in results.items():
+        print(benchmark)
+        for phase, rate in phases.items():
+            unit = UNITS.get(phase, "statements/s")
+            line = f"  {phase:<16}" + ("          n/a" if rate is None else f"{rate:>13,.0f} {unit}")
+            old = (baseline or {}).get(benchmark, {}).get(phase)
+            if rate is not None and old:
+                change = (rate - old) / old * 100
+                line += f"  {change:+6.1f}% vs baseline"
+                if change < -threshold:
+                    line += "  REGRESSION"
+                    regressed = True
+            print(line)
+    return regressed
+
+def main(argv:list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--size", choices=SIZES, action="append",
+                        help="corpus size to run, may be repeated (default: small and medium)")
+    parser.add_argument("--program", choices=PROGRAMS, action="append",
+                        help="only run these corpus programs")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per phase, the best one counts")
+    parser.add_argument("--save", metavar="JSON", help="write the results as a baseline file")
+    parser.add_argument("--baseline", metavar="JSON", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown that counts as a regression (default 10)")
+    parser.add_argument("--walker-timeout", type=float, default=10.0,
+                        help="seconds before the tree walker is given up on (default 10, 0 for none)")
+    args = parser.parse_args(argv)
+
+    # the tree walker recurses once per statement it skips inside a block
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100_000))
+    results = {}
+    for size in args.size or ["small", "medium"]:
+        for program in args.program or PROGRAMS:
+            source, statements = PROGRAMS[program](SIZES[size])
+            results[f"{program}/{size}"] = measure(source, statements, args.repeat, args.walker_timeout)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressed = report(results, baseline, args.threshold)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if regressed else 0
@@ -1,5 +1,29 @@
-class Error:
+import atexit
+import bisect
+import builtins
+import hashlib
+import marshal
+import mmap
+import operator
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from functools import lru_cache
+from itertools import repeat
+from types import MappingProxyType
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class Error(Exception):
     def __init__(self, title:str, body:str):
+        super().__init__(title, body)
         self.title = title
         self.body = body
     def __repr__(self):
@@ -30,6 +54,10 @@ TT_TYPE = "TYPE"
 TT_NEWLINE = "NEWLINE"
 TT_CODEBLOCK = "CODEBLOCK"
 TT_BOOL = "BOOL"
+TT_LSQUARE = "LSQUARE"
+TT_RSQUARE = "RSQUARE"
+TT_COMMA = "COMMA"
+TT_COLON = "COLON"
 
 LOWERCASE_LETTERS = "abcdefghijklmnopqrstuvwxyz"
 UPPERCASE_LETTERS = LOWERCASE_LETTERS.upper()
@@ -41,34 +69,329 @@ PARENTHESES = (TT_LPAREN,TT_RPAREN)
 CURLY_BRACKETS = (TT_LCURLY,TT_RCURLY)
 COMPARISON_TYPES = (TT_EQ,TT_NE,TT_LT,TT_LTE,TT_GT,TT_GTE)
 
-INBUILT_TYPES = ("int","float","string","bool")
+INBUILT_TYPES = ("int","float","string","bool","array")
 INBUILT_WORDS = ("if","else","while")
-INBUILT_FUNCTIONS = ("print","input","asInt")
 
-# "TYPE":[CODE]
-code_blocks = {}
+# Runtime values are plain Python objects; the token type is derived from them
+VALUE_TYPE_OF = {bool:TT_BOOL, int:TT_INT, float:TT_FLOAT, str:TT_STRING}
+NUMBER_TYPES = frozenset((bool, int, float))
 
 class Token:
-    def __init__(self, type:str, value:str):
+    __slots__ = ("type", "value", "line", "col")
+    def __init__(self, type:str, value, line:int=0, col:int=0):
         self.type = type
         self.value = value
+        self.line = line
+        self.col = col
     def __str__(self):
         output = self.type
         if self.type == TT_STRING:
-            output += " \"" + self.value + "\""
+            output += " \"" + str(self.value) + "\""
         elif self.type in VALUE_TYPES:
-            output += " " + self.value
+            output += " " + format_value(self.value)
         return output
     def __repr__(self):
         return self.__str__()
-    
-variables:dict = {"pi":Token(TT_FLOAT,"3.14192653589")}
 
-def get_words():
-    return tuple(INBUILT_FUNCTIONS.keys()) + INBUILT_TYPES + tuple(variables.keys())
+def format_value(value) -> str:
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    return str(value)
+
+# ---------------------------------------------------------------------------
+# Output channel
+#
+# Everything a program prints goes through one Output. Writes are collected
+# and handed to the sink in one write() once the buffer is full, after
+# flush_interval seconds, when a program finishes, before input() prompts
+# and at exit. The default sink is whatever sys.stdout is at flush time.
+# ---------------------------------------------------------------------------
+
+class Output:
+    # every Output usually ends up in sys.stdout, and a write there from
+    # two threads at once can interleave inside a line
+    write_lock = threading.Lock()
+
+    def __init__(self, sink=None, buffer_size:int=8192, flush_interval:float=0.1, debug_level:int=0):
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.debug_level = debug_level
+        self.parts = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, text:str):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def poll(self):
+        # for runs that go a long time without printing: writes are only
+        # timed when they happen, so the VM calls this between slices
+        if self.parts and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def print(self, *values):
+        self.write(" ".join(format_value(value) for value in values) + "\n")
+
+    def debug(self, level:int, *values):
+        if self.debug_level >= level:
+            self.write(" ".join(str(value) for value in values) + "\n")
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.parts:
+            return
+        text = "".join(self.parts)
+        self.parts.clear()
+        self.size = 0
+        sink = self.sink if self.sink is not None else sys.stdout
+        with self.write_lock:
+            sink.write(text)
+            sink.flush()
+
+    def redirect(self, sink=None):
+        # None goes back to sys.stdout; returns the previous sink
+        self.flush()
+        previous, self.sink = self.sink, sink
+        return previous
+
+output = Output()
+atexit.register(output.flush)
+
+OPERATORS = {
+    TT_PLUS: operator.add,
+    TT_MINUS: operator.sub,
+    TT_TIMES: operator.mul,
+    TT_DIVIDE: operator.truediv,
+    TT_EQ: operator.eq,
+    TT_NE: operator.ne,
+    TT_LT: operator.lt,
+    TT_LTE: operator.le,
+    TT_GT: operator.gt,
+    TT_GTE: operator.ge,
+}
+
+def apply_operator(op:str, left, right):
+    # int, float and bool mix the way Python does: bools count as 0/1 and a
+    # float on either side makes the result a float
+    if type(left) is Array or type(right) is Array:
+        return array_operator(op, left, right)
+    if type(left) in STRING_TYPES or type(right) in STRING_TYPES:
+        return string_operator(op, left, right)
+    if op == TT_DIVIDE and right == 0:
+        raise Error("DivisionWithZeroError","Cannot do division with 0")
+    return OPERATORS[op](left, right)
+
+# Arrays hold ints, floats or bools in one contiguous buffer: a NumPy array
+# when NumPy is installed, so a whole-array operation is one NumPy call, and
+# an array.array otherwise.
+ARRAY_TYPECODES = {TT_INT:"q", TT_FLOAT:"d", TT_BOOL:"b"}
+ARRAY_DTYPES = {TT_INT:"int64", TT_FLOAT:"float64", TT_BOOL:"bool"}
+# what each kind of array accepts when an element is stored
+ARRAY_ACCEPTS = {TT_INT:(TT_INT,TT_BOOL), TT_FLOAT:(TT_INT,TT_FLOAT,TT_BOOL), TT_BOOL:(TT_BOOL,)}
+
+class Array:
+    __slots__ = ("data", "kind")
+    def __init__(self, data, kind:str):
+        self.data = data
+        self.kind = kind
+    def __len__(self):
+        return len(self.data)
+    def __bool__(self):
+        raise Error("SyntaxError","An array has no single truth value")
+    def __str__(self):
+        return "[" + ", ".join(format_value(value) for value in self.values()) + "]"
+    def __repr__(self):
+        return self.__str__()
+    def values(self) -> list:
+        if self.kind == TT_BOOL and numpy is None:
+            return [bool(value) for value in self.data]
+        return self.data.tolist()
+    def scalar(self, value):
+        # one element of the buffer as a plain Python value
+        if numpy is not None:
+            return value.item()
+        return bool(value) if self.kind == TT_BOOL else value
+
+def make_array(values:list, kind:str=None) -> Array:
+    if kind is None:
+        kinds = {VALUE_TYPE_OF.get(type(value)) for value in values}
+        if not kinds <= {TT_INT, TT_FLOAT, TT_BOOL}:
+            raise Error("ArrayError","Arrays can only hold int, float and bool values")
+        kind = TT_BOOL if kinds == {TT_BOOL} else TT_FLOAT if TT_FLOAT in kinds else TT_INT
+    try:
+        if numpy is not None:
+            return Array(numpy.array(values, dtype=ARRAY_DTYPES[kind]), kind)
+        return Array(array(ARRAY_TYPECODES[kind], values), kind)
+    except OverflowError:
+        raise Error("ArrayError","Value does not fit in a 64-bit int")
+
+def array_operator(op:str, left, right) -> Array:
+    # element-wise; a scalar on either side is used for every element
+    kinds = [operand.kind if type(operand) is Array else VALUE_TYPE_OF.get(type(operand)) for operand in (left, right)]
+    if TT_STRING in kinds or None in kinds:
+        raise Error("SyntaxError"," Syntax")
+    if type(left) is Array and type(right) is Array and len(left) != len(right):
+        raise Error("ArrayError",f"Cannot combine arrays of length {len(left)} and {len(right)}")
+    if op == TT_DIVIDE and (0 in right.data if type(right) is Array else right == 0):
+        raise Error("DivisionWithZeroError","Cannot do division with 0")
+    if op in COMPARISON_TYPES:
+        kind = TT_BOOL
+    elif op == TT_DIVIDE or TT_FLOAT in kinds:
+        kind = TT_FLOAT
+    else:
+        kind = TT_INT
+    left = left.data if type(left) is Array else left
+    right = right.data if type(right) is Array else right
+    if numpy is not None:
+        if kind != TT_BOOL:
+            # bools count as 0/1 like they do outside arrays, NumPy would or them
+            left = left.astype("int64") if getattr(left, "dtype", None) == bool else left
+            right = right.astype("int64") if getattr(right, "dtype", None) == bool else right
+        try:
+            result = OPERATORS[op](left, right)
+        except OverflowError:
+            raise Error("ArrayError","Result does not fit in a 64-bit int")
+        if kind == TT_INT and op in (TT_PLUS, TT_MINUS, TT_TIMES) and int64_overflow(op, left, right, result):
+            raise Error("ArrayError","Result does not fit in a 64-bit int")
+        return Array(result, kind)
+    function = OPERATORS[op]
+    if type(left) is array and type(right) is array:
+        result = map(function, left, right)
+    elif type(left) is array:
+        result = map(function, left, repeat(right, len(left)))
+    else:
+        result = map(function, repeat(left, len(right)), right)
+    try:
+        return Array(array(ARRAY_TYPECODES[kind], result), kind)
+    except OverflowError:
+        raise Error("ArrayError","Result does not fit in a 64-bit int")
+
+def int64_overflow(op:str, left, right, result) -> bool:
+    # NumPy wraps int64 arithmetic around silently, the array module raises
+    left = numpy.asarray(left, dtype="int64")
+    right = numpy.asarray(right, dtype="int64")
+    if op == TT_PLUS:
+        # the sum's sign differs from both operands' signs
+        return bool(numpy.any(((left ^ result) & (right ^ result)) < 0))
+    if op == TT_MINUS:
+        return bool(numpy.any(((left ^ right) & (left ^ result)) < 0))
+    # a product that wrapped around doesn't divide back into its factors
+    smallest = numpy.iinfo("int64").min
+    with numpy.errstate(over="ignore"):
+        wrapped = (left != 0) & (result // numpy.where(left == 0, 1, left) != right)
+    wrapped |= ((left == -1) & (right == smallest)) | ((right == -1) & (left == smallest))
+    return bool(numpy.any(wrapped))
+
+def index_value(target, index):
+    if type(target) in STRING_TYPES:
+        return string_index(target, index)
+    if type(target) is not Array:
+        raise Error("IndexError","Only arrays and strings can be indexed")
+    if type(index) is not int:
+        raise Error("IndexError","Array indices must be ints")
+    try:
+        return target.scalar(target.data[index])
+    except IndexError:
+        raise Error("IndexError",f"Index {index} is out of range for an array of length {len(target)}")
+
+def store_index(target, index, value):
+    if type(target) is not Array:
+        raise Error("IndexError","Only arrays can be indexed")
+    if type(index) is not int:
+        raise Error("IndexError","Array indices must be ints")
+    kind = VALUE_TYPE_OF.get(type(value))
+    if kind not in ARRAY_ACCEPTS[target.kind]:
+        raise Error("AssignmentError",f"Cannot store a {str(kind).lower()} in an {target.kind.lower()} array")
+    try:
+        target.data[index] = value
+    except IndexError:
+        raise Error("IndexError",f"Index {index} is out of range for an array of length {len(target)}")
+    except OverflowError:
+        raise Error("ArrayError","Value does not fit in a 64-bit int")
+
+def slice_value(target, start, end):
+    # target[start:end]; a missing bound is None, and an array slice is a copy
+    if type(start) not in (int, type(None)) or type(end) not in (int, type(None)):
+        raise Error("IndexError","Slice bounds must be ints")
+    if type(target) in STRING_TYPES:
+        return str(target)[start:end]
+    if type(target) is not Array:
+        raise Error("IndexError","Only arrays and strings can be sliced")
+    data = target.data[start:end]
+    return Array(data.copy() if numpy is not None else data, target.kind)
+
+# Strings are Python strs, or a Text once + has built up a long one. The
+# Texts made by appending to the newest end of a Text share one list of
+# parts, so s = s + x in a loop appends to that list instead of copying s
+# every time; the str is only joined when something needs the whole text.
+TEXT_MIN_LENGTH = 256   # shorter results of + are plain strs, copying them is cheap
+
+class Text:
+    __slots__ = ("parts", "count", "length", "joined")
+    def __init__(self, parts:list, count:int, length:int):
+        self.parts = parts      # this text is parts[:count]
+        self.count = count
+        self.length = length
+        self.joined = None
+    def __len__(self):
+        return self.length
+    def __str__(self):
+        if self.joined is None:
+            self.joined = "".join(self.parts[:self.count])
+        return self.joined
+    def __repr__(self):
+        return repr(str(self))
+    def __eq__(self, other):
+        return type(other) in STRING_TYPES and str(self) == str(other)
+    def __hash__(self):
+        return hash(str(self))
+
+STRING_TYPES = (str, Text)
+VALUE_TYPE_OF[Text] = TT_STRING
+
+def concat(left, right):
+    right = str(right)
+    if type(left) is Text and left.count == len(left.parts):
+        # nothing has been appended to this text yet, so it can be extended in place
+        left.parts.append(right)
+        return Text(left.parts, left.count + 1, left.length + len(right))
+    left = str(left)
+    if len(left) + len(right) < TEXT_MIN_LENGTH:
+        return left + right
+    return Text([left, right], 2, len(left) + len(right))
+
+def string_operator(op:str, left, right):
+    other = right if type(left) in STRING_TYPES else left
+    if type(other) not in STRING_TYPES:
+        raise Error("TypeError",f"Cannot use {OPERATOR_SYMBOLS[op]} on a string and {article(type_name(other))}")
+    if op == TT_PLUS:
+        return concat(left, right)
+    if op in COMPARISON_TYPES:
+        return OPERATORS[op](str(left), str(right))
+    raise Error("TypeError",f"Cannot use {OPERATOR_SYMBOLS[op]} on strings")
+
+def string_index(target, index):
+    if type(index) is not int:
+        raise Error("IndexError","String indices must be ints")
+    try:
+        return str(target)[index]
+    except IndexError:
+        raise Error("IndexError",f"Index {index} is out of range for a string of length {len(target)}")
+
+# names every program starts with
+CONSTANTS = {"pi":3.14192653589}
+
+def get_words(variables:dict):
+    return tuple(BUILTINS) + INBUILT_TYPES + tuple(variables.keys())
 
 class Lexer:
-    def __init__(self,text,is_filepath=False):
+    def __init__(self,text,is_filepath=False,fast=False):
         if is_filepath:
             with open(text,"r") as f:
                 self.code = f.read()
@@ -76,14 +399,29 @@ class Lexer:
             self.code = text
         self.tokens = [[]]
         self.index = 0
+        self.line = 1
+        self.line_start = 0
+        self.fast = fast
+        self.stream = None
 
     def make_tokens(self):
+        if self.fast:
+            # fills self.stream; self.tokens is only built if someone asks for lines
+            self.stream = scan(self.code)
+            return
         while self.index < len(self.code):
+            start = self.index
+            line_number = self.line
+            column = start - self.line_start + 1
+            line = self.tokens[-1]
+            count = len(line)
             match self.code[self.index]:
                 case ' ' | '\t':
                     pass #just skip whitespace
                 case '\n':
                     self.tokens.append([])
+                    self.line += 1
+                    self.line_start = self.index + 1
                 case '+':
                     self.tokens[-1].append(Token(TT_PLUS,""))
                 case '-':
@@ -103,6 +441,14 @@ class Lexer:
                     self.tokens[-1].append(Token(TT_LCURLY,""))
                 case '}':
                     self.tokens[-1].append(Token(TT_RCURLY,""))
+                case '[':
+                    self.tokens[-1].append(Token(TT_LSQUARE,""))
+                case ']':
+                    self.tokens[-1].append(Token(TT_RSQUARE,""))
+                case ',':
+                    self.tokens[-1].append(Token(TT_COMMA,""))
+                case ':':
+                    self.tokens[-1].append(Token(TT_COLON,""))
                 case '=' | '<' | '>':
                     self.tokens[-1].append(self.makeEqual())
                 case '"' | '\'':
@@ -113,6 +459,9 @@ class Lexer:
                     else:
                         print("Bad error D:",self.code[self.index])
                         return
+            if self.tokens[-1] is line and len(line) > count:
+                line[-1].line = line_number
+                line[-1].col = column
             self.index += 1
         return
 
@@ -124,16 +473,16 @@ class Lexer:
         isFloat = False
         while self.index < len(self.code):
             match self.code[self.index]:
-                case '.':
+                case '.' if not isFloat:
                     isFloat = True
                     curr += self.code[self.index]
                 case '0' | '1' | '2' | '3' | '4' | '5' | '6' | '7' | '8' | '9':
                     curr += self.code[self.index]
                 case _:
                     self.index -= 1
-                    return Token(TT_FLOAT if isFloat else TT_INT,curr)
+                    return Token(TT_FLOAT,float(curr)) if isFloat else Token(TT_INT,int(curr))
             self.index += 1
-        return Token(TT_FLOAT if isFloat else TT_INT,curr)
+        return Token(TT_FLOAT,float(curr)) if isFloat else Token(TT_INT,int(curr))
     
     def makeWord(self):
         curr = ""
@@ -157,6 +506,9 @@ class Lexer:
             curr += self.code[self.index]
             self.index += 1
         self.index += 1 # ending qoute
+        if "\n" in curr:
+            self.line += curr.count("\n")
+            self.line_start = self.code.rindex("\n", 0, self.index) + 1
         return Token(TT_STRING,curr)
         
     def makeEqual(self):
@@ -185,6 +537,122 @@ class Lexer:
                 return Token(TT_GT,"")
 
 
+# Fast lexer mode: one regex pass over the source, tokens kept as parallel
+# arrays of type codes and start/end offsets. Token objects are only built
+# when something indexes into the stream.
+TOKEN_TYPES = (TT_NEWLINE,TT_INT,TT_FLOAT,TT_STRING,TT_WORD,TT_TYPE,TT_PLUS,TT_MINUS,TT_TIMES,TT_DIVIDE,
+               TT_LPAREN,TT_RPAREN,TT_LCURLY,TT_RCURLY,TT_ASSIGN,TT_EQ,TT_LT,TT_LTE,TT_GT,TT_GTE,
+               TT_LSQUARE,TT_RSQUARE,TT_COMMA,TT_COLON)
+TOKEN_CODES = {type: code for code, type in enumerate(TOKEN_TYPES)}
+SYMBOL_CODES = {"+":TOKEN_CODES[TT_PLUS], "-":TOKEN_CODES[TT_MINUS], "*":TOKEN_CODES[TT_TIMES],
+                "/":TOKEN_CODES[TT_DIVIDE], "(":TOKEN_CODES[TT_LPAREN], ")":TOKEN_CODES[TT_RPAREN],
+                "{":TOKEN_CODES[TT_LCURLY], "}":TOKEN_CODES[TT_RCURLY], "=":TOKEN_CODES[TT_ASSIGN],
+                "==":TOKEN_CODES[TT_EQ], "<":TOKEN_CODES[TT_LT], "<=":TOKEN_CODES[TT_LTE],
+                ">":TOKEN_CODES[TT_GT], ">=":TOKEN_CODES[TT_GTE], "[":TOKEN_CODES[TT_LSQUARE],
+                "]":TOKEN_CODES[TT_RSQUARE], ",":TOKEN_CODES[TT_COMMA], ":":TOKEN_CODES[TT_COLON]}
+
+TOKEN_PATTERN = re.compile(r"""
+     ([ \t\r]+)                   # 1 whitespace
+    |(\n)                         # 2 newline
+    |([0-9]+\.[0-9]*)             # 3 float
+    |([0-9]+)                     # 4 int
+    |([A-Za-z]+)                  # 5 word
+    |("[^"]*"?|'[^']*'?)          # 6 string, unterminated runs to the end
+    |(==|<=|>=|[-+*/(){}=<>\[\],:]) # 7 symbol
+    |(.)                          # 8 anything else is an error
+""", re.VERBOSE)
+
+class TokenStream:
+    def __init__(self, code:str, kinds:array, starts:array, ends:array):
+        self.code = code
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.line_starts = None
+        self.error = None # set by scan() when it stops at a character it can't read
+
+    def position(self, offset:int) -> tuple[int, int]:
+        # line and column (both from 1) of a source offset
+        if self.line_starts is None:
+            self.line_starts = [0] + [match.end() for match in re.finditer("\n", self.code)]
+        line = bisect.bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index:int) -> Token:
+        return self.token(index)
+
+    def types(self) -> list[str]:
+        return [TOKEN_TYPES[kind] for kind in self.kinds]
+
+    def token(self, index:int) -> Token:
+        type = TOKEN_TYPES[self.kinds[index]]
+        start = self.starts[index]
+        text = self.code[start:self.ends[index]]
+        line, col = self.position(start)
+        if type == TT_INT:
+            return Token(type,int(text),line,col)
+        if type == TT_FLOAT:
+            return Token(type,float(text),line,col)
+        if type == TT_STRING:
+            return Token(type,text[1:-1] if len(text) > 1 and text[-1] == text[0] else text[1:],line,col)
+        if type in (TT_WORD, TT_TYPE):
+            return Token(type,text,line,col)
+        return Token(type,"",line,col)
+
+    def lines(self) -> list[list[Token]]:
+        # the same shape Lexer.tokens has, for the Parser and the tree walker
+        lines = [[]]
+        newline = TOKEN_CODES[TT_NEWLINE]
+        for index, kind in enumerate(self.kinds):
+            if kind == newline:
+                lines.append([])
+            else:
+                lines[-1].append(self.token(index))
+        return lines
+
+def scan(code:str) -> TokenStream:
+    kinds = array("B")
+    starts = array("q")
+    ends = array("q")
+    add_kind = kinds.append
+    add_start = starts.append
+    add_end = ends.append
+    newline = TOKEN_CODES[TT_NEWLINE]
+    int_code = TOKEN_CODES[TT_INT]
+    float_code = TOKEN_CODES[TT_FLOAT]
+    string_code = TOKEN_CODES[TT_STRING]
+    word_code = TOKEN_CODES[TT_WORD]
+    type_code = TOKEN_CODES[TT_TYPE]
+    types = frozenset(INBUILT_TYPES)
+    for match in TOKEN_PATTERN.finditer(code):
+        group = match.lastindex
+        if group == 1:
+            continue
+        elif group == 5:
+            add_kind(type_code if match.group() in types else word_code)
+        elif group == 7:
+            add_kind(SYMBOL_CODES[match.group()])
+        elif group == 2:
+            add_kind(newline)
+        elif group == 4:
+            add_kind(int_code)
+        elif group == 3:
+            add_kind(float_code)
+        elif group == 6:
+            add_kind(string_code)
+        else:
+            stream = TokenStream(code, kinds, starts, ends)
+            line, _ = stream.position(match.start())
+            stream.error = Error("SyntaxError",f"Unexpected character {match.group()!r} (line {line})")
+            return stream
+        start, end = match.span()
+        add_start(start)
+        add_end(end)
+    return TokenStream(code, kinds, starts, ends)
+
 class Parser:
     def __init__(self, tokens:list[Token]):
         self.AST = []
@@ -312,8 +780,11 @@ class Parser:
         return node
 
 class Interpreter:
-    def __init__(self):
+    def __init__(self, limits=None):
+        self.limits = limits or Limits()
+        self.usage = Usage()
         self.code_block = []
+        self.variables = {name:Token(VALUE_TYPE_OF[type(value)],value) for name, value in CONSTANTS.items()}
     def interpret(self,tokens,ignoreCodeBlockAmount=0) -> list | Token:
         
         pos = 0
@@ -341,15 +812,22 @@ class Interpreter:
                 if len(self.code_block) > ignoreCodeBlockAmount:
                     self.code_block[-1][2].append(curr)
                 if curr.type == TT_RCURLY:
-                    print('\n',self.code_block[-1],'\n')
-                    output = self.interpret(self.code_block[-1][1],1+ignoreCodeBlockAmount)
+                    output.debug(1,self.code_block[-1])
+                    condition = self.interpret(self.code_block[-1][1],1+ignoreCodeBlockAmount)
                     if self.code_block[-1][0] == "if":
-                        if output.value == "True":
+                        if condition.value is True:
                             self.interpret(self.code_block[-1][2],1+ignoreCodeBlockAmount)
                     if self.code_block[-1][0] == "while":
-                        while output.value == "True":
+                        while condition.value is True:
+                            self.usage.iterations += 1
+                            if self.usage.iterations % self.limits.check_every == 0:
+                                output.poll()
+                                try:
+                                    self.limits.check(self.usage)
+                                except Error as error:
+                                    return error
                             self.interpret(self.code_block[-1][2],1+ignoreCodeBlockAmount)
-                            output = self.interpret(self.code_block[-1][1],1+ignoreCodeBlockAmount)
+                            condition = self.interpret(self.code_block[-1][1],1+ignoreCodeBlockAmount)
                     self.code_block = self.code_block[0:-1]
                 if len(self.code_block) > ignoreCodeBlockAmount:
                     pos += 1
@@ -376,10 +854,10 @@ class Interpreter:
                     pos += 1
                     end = tokens[pos]
                     if end[0].type == TT_ASSIGN:
-                        if curr.value in variables.keys():
+                        if curr.value in self.variables.keys():
                             return Error("AssignmentError","Cannot initialize an already existing variable.")     
-                        variables[name.value] = self.interpret(end[1],ignoreCodeBlockAmount)
-                        print(variables)
+                        self.variables[name.value] = self.interpret(end[1],ignoreCodeBlockAmount)
+                        output.debug(1,self.variables)
                     else:
                         return Error("AssignmentError","variable assignment.")
                 if curr.type == TT_WORD:
@@ -393,10 +871,10 @@ class Interpreter:
                             else:
                                 temp = tokens[pos][0]
                             if temp.type == TT_ASSIGN:
-                                if curr.value not in variables.keys():
+                                if curr.value not in self.variables.keys():
                                     return Error("AssignmentError","Missing variable type initializer.")        
                                 if len(tokens[pos]) > 1:
-                                    variables[curr.value] = self.interpret(tokens[pos][1],ignoreCodeBlockAmount)
+                                    self.variables[curr.value] = self.interpret(tokens[pos][1],ignoreCodeBlockAmount)
                                 else:
                                     return Error("AssignmentError","Missing value")   
                             elif temp.type == TT_LPAREN:
@@ -409,27 +887,25 @@ class Interpreter:
                                     self.code_block.append([curr.value,tokens[pos-1][1],[          ]])
                                     pos += 1
                         elif tokens[pos].type == TT_LPAREN:
-                                if curr.value not in INBUILT_FUNCTIONS + INBUILT_WORDS:
+                                if curr.value not in BUILTINS and curr.value not in INBUILT_WORDS:
                                     return Error("AssignmentError","Missing variable type initializer.")      
                                 pos += 1  
-                                if curr.value in INBUILT_FUNCTIONS: # these functions are hardcoded
-                                    if curr.value == "print":
-                                        print(self.interpret(tokens[pos],ignoreCodeBlockAmount).value)
-                                    if curr.value == "input":
-                                        number = Token(TT_STRING,input(self.interpret(tokens[pos],ignoreCodeBlockAmount).value))
-                                    if curr.value == "asInt":
-                                        toConvert = self.interpret(tokens[pos],ignoreCodeBlockAmount).value
-                                        try:
-                                            number = int(toConvert)
-                                        except:
-                                            return Error("Conversion Error","Cannot convert to int")
+                                if curr.value in BUILTINS: # called with the one argument the Parser gives us
+                                    try:
+                                        result = BUILTINS[curr.value].function(self.interpret(tokens[pos],ignoreCodeBlockAmount).value)
+                                    except Error as error:
+                                        return error
+                                    if result is not None:
+                                        if type(result) not in VALUE_TYPE_OF:
+                                            return Error("FunctionCallError",f"{curr.value} gives a value the interpreter can't hold")
+                                        number = Token(VALUE_TYPE_OF[type(result)],result)
                                 pos += 1
                                 if len(tokens) <= pos:
                                     return Error("FunctionCallError","Missing the right paren")   
                                 if tokens[pos].type != TT_RPAREN:
                                     return Error("FunctionCallError","Missing the right paren")      
-                    if curr.value in variables.keys():
-                        number = variables[curr.value]
+                    if curr.value in self.variables.keys():
+                        number = self.variables[curr.value]
                     else:
                         number = curr
                 if curr.type == TT_LPAREN:
@@ -454,53 +930,2487 @@ class Interpreter:
         return number
 
     def calculate(self,firstValue:Token,middleValue:Token,secondValue:Token):
-        operationType = None
-        firstNum = None
-        secondNum = None
-        # Automatic Conversion from INT to FLOAT when a FLOAT is in the calculation
-        if (firstValue.type == TT_FLOAT and secondValue.type in (TT_INT,TT_BOOL)) or (firstValue.type in (TT_INT,TT_BOOL) and secondValue.type == TT_FLOAT):
-            operationType = TT_FLOAT
-            if firstValue.type == TT_BOOL:
-                firstNum = 1.0 if firstValue.value == "true" else 0.0
+        try:
+            result = apply_operator(middleValue.type,firstValue.value,secondValue.value)
+        except Error as error:
+            return error
+        return Token(VALUE_TYPE_OF[type(result)],result)
+
+
+# ---------------------------------------------------------------------------
+# Bytecode compiler and VM
+#
+# The Interpreter above walks the Parser's nested lists on every run. The
+# Compiler below lowers a program into a flat list of (opcode, argument)
+# instructions once, and the VirtualMachine executes them in a single loop.
+# The Parser's lists drop tokens in a few shapes (anything after a
+# parenthesised group, `==` binding tighter than `+`), so the Compiler reads
+# the same token lines the Parser gets and builds a small tree of its own.
+# ---------------------------------------------------------------------------
+
+class Node:
+    # every node gets its source position from at() when it is created
+    __slots__ = ("line", "col")
+    def at(self, line:int, col:int):
+        self.line = line
+        self.col = col
+        return self
+    def __repr__(self):
+        fields = ", ".join(repr(getattr(self, name)) for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+class Constant(Node):
+    __slots__ = ("value",)
+    def __init__(self, value):
+        self.value = value
+
+class Name(Node):
+    # local: the slot is in the running function's frame, not the globals
+    __slots__ = ("name", "slot", "local")
+    def __init__(self, name:str):
+        self.name = name
+        self.slot = None
+        self.local = False
+
+class BinaryOp(Node):
+    # operands holds the operand types once the TypeChecker has run
+    __slots__ = ("left", "op", "right", "operands")
+    def __init__(self, left:Node, op:str, right:Node):
+        self.left = left
+        self.op = op
+        self.right = right
+        self.operands = (None, None)
+
+class Call(Node):
+    # function is the FunctionDef a user function call resolved to, guards
+    # the parameter type of each argument that has to be checked at runtime
+    __slots__ = ("name", "args", "function", "guards")
+    def __init__(self, name:str, args:list):
+        self.name = name
+        self.args = args
+        self.function = None
+        self.guards = None
+
+class ArrayLiteral(Node):
+    __slots__ = ("items",)
+    def __init__(self, items:list):
+        self.items = items
+
+class Index(Node):
+    __slots__ = ("target", "index")
+    def __init__(self, target:Node, index:Node):
+        self.target = target
+        self.index = index
+
+class Slice(Node):
+    # start and end are None when left out
+    __slots__ = ("target", "start", "end")
+    def __init__(self, target:Node, start:Node | None, end:Node | None):
+        self.target = target
+        self.start = start
+        self.end = end
+
+class Declaration(Node):
+    # guard is the variable's type when the value has to be checked at runtime
+    __slots__ = ("type", "name", "value", "slot", "local", "guard")
+    def __init__(self, type:str, name:str, value:Node):
+        self.type = type
+        self.name = name
+        self.value = value
+        self.slot = None
+        self.local = False
+        self.guard = None
+
+class Assignment(Node):
+    __slots__ = ("name", "value", "slot", "local", "guard")
+    def __init__(self, name:str, value:Node):
+        self.name = name
+        self.value = value
+        self.slot = None
+        self.local = False
+        self.guard = None
+
+class IndexAssignment(Node):
+    __slots__ = ("target", "index", "value")
+    def __init__(self, target:Node, index:Node, value:Node):
+        self.target = target
+        self.index = index
+        self.value = value
+
+class If(Node):
+    __slots__ = ("condition", "body", "orelse")
+    def __init__(self, condition:Node, body:list, orelse:list):
+        self.condition = condition
+        self.body = body
+        self.orelse = orelse
+
+class While(Node):
+    __slots__ = ("condition", "body")
+    def __init__(self, condition:Node, body:list):
+        self.condition = condition
+        self.body = body
+
+class FunctionDef(Node):
+    # params are value-less Declarations; pure is the memo cache size, or
+    # None for a function that isn't pure. index and slot_count are filled
+    # in by the Resolver.
+    __slots__ = ("type", "name", "params", "body", "pure", "index", "slot_count")
+    def __init__(self, type:str, name:str, params:list, body:list):
+        self.type = type
+        self.name = name
+        self.params = params
+        self.body = body
+        self.pure = None
+        self.index = None
+        self.slot_count = 0
+
+class Return(Node):
+    # guard is the function's type when the value has to be checked at runtime
+    __slots__ = ("value", "guard")
+    def __init__(self, value:Node):
+        self.value = value
+        self.guard = None
+
+class ExprStatement(Node):
+    __slots__ = ("expr",)
+    def __init__(self, expr:Node):
+        self.expr = expr
+
+class Block(Node):
+    # a scoped statement list with no condition, left behind by the Optimizer
+    __slots__ = ("body",)
+    def __init__(self, body:list):
+        self.body = body
+
+class Optimizer:
+    # Constant folding, dead if/while removal and loop-invariant hoisting.
+    # Folding goes through apply_operator, so int/float/bool coercion is the
+    # same as at runtime, and anything that would raise is left for runtime.
+    def __init__(self):
+        self.hoisted = 0
+        self.pure = set()
+        self.scalars = set()
+
+    def optimize(self, body:list[Node]) -> list[Node]:
+        self.pure = {node.name for node in body if isinstance(node, FunctionDef) and node.pure is not None}
+        # names only ever declared as numbers or strings: the TypeChecker
+        # rejects any operation on them that could fail, other than a
+        # division. Arrays of different lengths, and inputs that could be
+        # arrays, fail at runtime.
+        types = {}
+        def collect(node):
+            if isinstance(node, list):
+                for item in node:
+                    collect(item)
+                return
+            if isinstance(node, Declaration):
+                types.setdefault(node.name, set()).add(node.type)
+            for name in node.__slots__:
+                if isinstance(getattr(node, name), (Node, list)):
+                    collect(getattr(node, name))
+        collect(body)
+        self.scalars = {name for name, declared in types.items() if declared <= {*NUMERIC_TYPES, "string"}}
+        return self.block(body)
+
+    def block(self, body:list[Node]) -> list[Node]:
+        result = []
+        for node in body:
+            result += self.statement(node)
+        return result
+
+    def statement(self, node:Node) -> list[Node]:
+        if isinstance(node, (Declaration, Assignment)):
+            node.value = self.expr(node.value)
+        elif isinstance(node, IndexAssignment):
+            node.target = self.expr(node.target)
+            node.index = self.expr(node.index)
+            node.value = self.expr(node.value)
+        elif isinstance(node, ExprStatement):
+            node.expr = self.expr(node.expr)
+        elif isinstance(node, If):
+            node.condition = self.expr(node.condition)
+            node.body = self.block(node.body)
+            node.orelse = self.block(node.orelse)
+            if isinstance(node.condition, Constant):
+                taken = node.body if node.condition.value else node.orelse
+                return [Block(taken).at(node.line, node.col)] if taken else []
+        elif isinstance(node, While):
+            node.condition = self.expr(node.condition)
+            if isinstance(node.condition, Constant) and not node.condition.value:
+                return []
+            node.body = self.block(node.body)
+            return self.hoist(node)
+        elif isinstance(node, (Block, FunctionDef)):
+            node.body = self.block(node.body)
+        elif isinstance(node, Return):
+            node.value = self.expr(node.value)
+        return [node]
+
+    def expr(self, node:Node) -> Node:
+        if isinstance(node, BinaryOp):
+            node.left = self.expr(node.left)
+            node.right = self.expr(node.right)
+            if isinstance(node.left, Constant) and isinstance(node.right, Constant):
+                try:
+                    return Constant(apply_operator(node.op, node.left.value, node.right.value)).at(node.line, node.col)
+                except Error:
+                    pass
+        elif isinstance(node, Call):
+            node.args = [self.expr(arg) for arg in node.args]
+        elif isinstance(node, ArrayLiteral):
+            node.items = [self.expr(item) for item in node.items]
+        elif isinstance(node, Index):
+            node.target = self.expr(node.target)
+            node.index = self.expr(node.index)
+        elif isinstance(node, Slice):
+            node.target = self.expr(node.target)
+            node.start = node.start and self.expr(node.start)
+            node.end = node.end and self.expr(node.end)
+        return node
+
+    def hoist(self, loop:While) -> list[Node]:
+        # Only expressions that run on every iteration are hoisted (top-level
+        # statements of the body), and the hoisted values are computed under
+        # a copy of the loop condition, so nothing runs that the original
+        # loop would not have run. They run earlier though, ahead of anything
+        # the body prints, so only expressions that can't fail are hoisted:
+        # no division, and only over names that are always numbers or strings.
+        # arrays are shared, so storing into an element through any name can
+        # change what an expression over another name evaluates to
+        if self.has_call(loop.condition) or self.stores_elements(loop.body) or self.calls_functions(loop.body):
+            return [loop]
+        modified = set()
+        self.modified_names(loop.body, modified)
+        hoisted = []
+        for node in loop.body:
+            if isinstance(node, (Declaration, Assignment)):
+                node.value = self.replace_invariant(node.value, modified, hoisted)
+            elif isinstance(node, ExprStatement):
+                node.expr = self.replace_invariant(node.expr, modified, hoisted)
+            elif isinstance(node, (If, While)):
+                node.condition = self.replace_invariant(node.condition, modified, hoisted)
+        if not hoisted:
+            return [loop]
+        return [If(loop.condition, hoisted + [loop], []).at(loop.line, loop.col)]
+
+    def replace_invariant(self, node:Node, modified:set, hoisted:list) -> Node:
+        if isinstance(node, BinaryOp):
+            if self.is_invariant(node, modified):
+                name = f"_hoisted{self.hoisted}"
+                self.hoisted += 1
+                hoisted.append(Declaration(None, name, node).at(node.line, node.col))
+                self.scalars.add(name)
+                return Name(name).at(node.line, node.col)
+            node.left = self.replace_invariant(node.left, modified, hoisted)
+            node.right = self.replace_invariant(node.right, modified, hoisted)
+        elif isinstance(node, Call):
+            node.args = [self.replace_invariant(arg, modified, hoisted) for arg in node.args]
+        return node
+
+    def is_invariant(self, node:Node, modified:set) -> bool:
+        if isinstance(node, Constant):
+            return True
+        if isinstance(node, Name):
+            return node.name not in modified and node.name in self.scalars
+        if isinstance(node, BinaryOp):
+            return node.op != TT_DIVIDE and self.is_invariant(node.left, modified) and self.is_invariant(node.right, modified)
+        return False
+
+    def has_call(self, node:Node) -> bool:
+        if isinstance(node, Call):
+            return True
+        if isinstance(node, BinaryOp):
+            return self.has_call(node.left) or self.has_call(node.right)
+        return False
+
+    def calls_functions(self, node:Node | list) -> bool:
+        # a function that isn't pure can assign any global
+        if isinstance(node, list):
+            return any(self.calls_functions(item) for item in node)
+        if isinstance(node, Call):
+            return node.name not in BUILTINS and node.name not in self.pure or self.calls_functions(node.args)
+        return any(self.calls_functions(getattr(node, name)) for name in node.__slots__
+                   if isinstance(getattr(node, name), (Node, list)))
+
+    def stores_elements(self, body:list[Node]) -> bool:
+        for node in body:
+            if isinstance(node, IndexAssignment):
+                return True
+            if isinstance(node, If) and (self.stores_elements(node.body) or self.stores_elements(node.orelse)):
+                return True
+            if isinstance(node, (While, Block)) and self.stores_elements(node.body):
+                return True
+        return False
+
+    def modified_names(self, body:list[Node], modified:set):
+        for node in body:
+            if isinstance(node, (Declaration, Assignment)):
+                modified.add(node.name)
+            elif isinstance(node, If):
+                self.modified_names(node.body, modified)
+                self.modified_names(node.orelse, modified)
+            elif isinstance(node, (While, Block)):
+                self.modified_names(node.body, modified)
+
+class Resolver:
+    # Gives every declared variable a slot index ahead of time, so the VM
+    # indexes a list instead of hashing names. Each { } block is a scope;
+    # its slots are handed back when it closes and reused by the next block.
+    # A function's parameters and variables get slots in its own call frame,
+    # numbered from 0; the globals stay visible from inside it.
+    def __init__(self, redeclare:bool=False):
+        self.scopes = [{name: slot for slot, name in enumerate(CONSTANTS)}]
+        self.next_slot = len(CONSTANTS)
+        self.slot_count = self.next_slot
+        # a REPL session may declare a global again; it keeps its old slot
+        self.redeclare = redeclare
+        self.functions = {}    # name -> FunctionDef
+        self.compiled = []     # FunctionDef.index -> Function, filled in by the Compiler
+        self.function = None   # the FunctionDef being resolved
+
+    def resolve(self, body:list[Node]) -> int:
+        # functions are declared first, so they can be called before their
+        # definition and from each other
+        for node in body:
+            if isinstance(node, FunctionDef):
+                self.define(node)
+        for node in body:
+            self.statement(node)
+        return self.slot_count
+
+    def define(self, node:FunctionDef):
+        if node.name in BUILTINS:
+            raise Error("FunctionError",f"{node.name} is a builtin function")
+        previous = self.functions.get(node.name)
+        if previous is not None and not self.redeclare:
+            raise Error("FunctionError",f"{node.name} is already defined")
+        if previous is not None and previous is not node:
+            node.index = previous.index
+        else:
+            node.index = len(self.compiled)
+            self.compiled.append(None)
+        self.functions[node.name] = node
+
+    def declare(self, name:str) -> int:
+        slot = self.next_slot
+        self.scopes[-1][name] = slot
+        self.next_slot += 1
+        self.slot_count = max(self.slot_count, self.next_slot)
+        return slot
+
+    def lookup(self, name:str) -> tuple[int | None, bool]:
+        # (slot, whether it is in the function's frame)
+        for depth in range(len(self.scopes) - 1, -1, -1):
+            if name in self.scopes[depth]:
+                return self.scopes[depth][name], depth > 0 and self.function is not None
+        return None, False
+
+    def block(self, body:list[Node]):
+        self.scopes.append({})
+        first_slot = self.next_slot
+        for node in body:
+            self.statement(node)
+        self.scopes.pop()
+        self.next_slot = first_slot
+
+    def statement(self, node:Node):
+        if isinstance(node, Declaration):
+            self.expr(node.value)
+            node.local = self.function is not None
+            if node.name in self.scopes[-1]:
+                if self.redeclare and len(self.scopes) == 1:
+                    node.slot = self.scopes[0][node.name]
+                    return
+                raise Error("AssignmentError",f"Cannot initialize an already existing variable: {node.name}")
+            node.slot = self.declare(node.name)
+        elif isinstance(node, Assignment):
+            self.expr(node.value)
+            node.slot, node.local = self.lookup(node.name)
+            if node.slot is None:
+                raise Error("AssignmentError",f"Missing variable type initializer: {node.name}")
+            if self.function is not None and self.function.pure is not None and not node.local:
+                raise Error("FunctionError",f"The pure function {self.function.name} cannot assign the global {node.name}")
+        elif isinstance(node, IndexAssignment):
+            self.expr(node.target)
+            self.expr(node.index)
+            self.expr(node.value)
+        elif isinstance(node, If):
+            self.expr(node.condition)
+            self.block(node.body)
+            self.block(node.orelse)
+        elif isinstance(node, While):
+            self.expr(node.condition)
+            self.block(node.body)
+        elif isinstance(node, Block):
+            self.block(node.body)
+        elif isinstance(node, ExprStatement):
+            self.expr(node.expr)
+        elif isinstance(node, FunctionDef):
+            self.function_body(node)
+        elif isinstance(node, Return):
+            if self.function is None:
+                raise Error("SyntaxError","return outside a function")
+            self.expr(node.value)
+
+    def function_body(self, node:FunctionDef):
+        if len(self.scopes) > 1 or node.index is None:
+            raise Error("SyntaxError",f"{node.name} must be defined at the top level")
+        outer = (self.next_slot, self.slot_count)
+        self.function = node
+        self.scopes.append({})
+        self.next_slot = self.slot_count = 0
+        try:
+            for param in node.params:
+                if param.name in self.scopes[-1]:
+                    raise Error("AssignmentError",f"{node.name} has two parameters called {param.name}")
+                param.slot = self.declare(param.name)
+                param.local = True
+            self.block(node.body)
+            node.slot_count = self.slot_count
+        finally:
+            self.scopes.pop()
+            self.function = None
+            self.next_slot, self.slot_count = outer
+
+    def expr(self, node:Node):
+        if isinstance(node, Name):
+            node.slot, node.local = self.lookup(node.name)
+            if node.slot is None:
+                raise Error("NameError",f"{node.name} is not defined")
+            if self.function is not None and self.function.pure is not None and not node.local \
+                    and node.slot >= len(CONSTANTS):
+                raise Error("FunctionError",f"The pure function {self.function.name} cannot read the global {node.name}")
+        elif isinstance(node, BinaryOp):
+            self.expr(node.left)
+            self.expr(node.right)
+        elif isinstance(node, Call):
+            for arg in node.args:
+                self.expr(arg)
+            self.call(node)
+        elif isinstance(node, ArrayLiteral):
+            for item in node.items:
+                self.expr(item)
+        elif isinstance(node, Index):
+            self.expr(node.target)
+            self.expr(node.index)
+        elif isinstance(node, Slice):
+            for part in (node.target, node.start, node.end):
+                if part is not None:
+                    self.expr(part)
+
+    def call(self, node:Call):
+        node.function = self.functions.get(node.name)
+        pure = self.function is not None and self.function.pure is not None
+        if node.function is None:
+            builtin = BUILTINS.get(node.name)
+            if builtin is None:
+                raise Error("FunctionCallError",f"Unknown function {node.name}")
+            fewest, most = builtin.arity
+            if len(node.args) < fewest or (most is not None and len(node.args) > most):
+                raise Error("FunctionCallError",f"{node.name} takes {builtin.arity_text()}, not {len(node.args)}")
+            if pure and not builtin.pure:
+                raise Error("FunctionError",f"The pure function {self.function.name} cannot call {node.name}")
+            return
+        if len(node.args) != len(node.function.params):
+            count = len(node.function.params)
+            raise Error("FunctionCallError",f"{node.name} takes {count} argument{'s' * (count != 1)}, not {len(node.args)}")
+        if pure and node.function.pure is None:
+            raise Error("FunctionError",f"The pure function {self.function.name} cannot call {node.name}, which isn't pure")
+
+# Static types are the declaration keywords, plus "number" for a value that
+# is some int, float or bool, and "none" for what print() gives back.
+# FISSION_TYPE_OF names the type of a constant.
+FISSION_TYPE_OF = {bool:"bool", int:"int", float:"float", str:"string", Text:"string"}
+NUMERIC_TYPES = ("int","float","bool","number")
+OPERATOR_SYMBOLS = {TT_PLUS:"+", TT_MINUS:"-", TT_TIMES:"*", TT_DIVIDE:"/", TT_EQ:"==",
+                    TT_NE:"!=", TT_LT:"<", TT_LTE:"<=", TT_GT:">", TT_GTE:">="}
+
+def assignable(target:str | None, value:str | None) -> bool:
+    if target is None or value is None or target == value:
+        return True
+    if target in ("float", "number"):
+        return value in NUMERIC_TYPES
+    if target == "int":
+        return value in ("bool", "number")
+    return False
+
+def accepts(expected:str | tuple | None, value:str | None) -> bool:
+    # expected is a type, a tuple of types that are all fine, or None for anything
+    if isinstance(expected, tuple):
+        return any(assignable(option, value) for option in expected)
+    return assignable(expected, value)
+
+def article(type:str | tuple) -> str:
+    if isinstance(type, tuple):
+        return " or ".join(article(option) for option in type)
+    return ("an " if type[0] in "aeiou" else "a ") + type
+
+class TypeChecker:
+    # Runs after the Resolver: works out the type of every expression,
+    # raises a TypeError before anything runs, and stores the operand types
+    # on each BinaryOp so the Compiler can skip the VM's runtime type tests.
+    # slots maps a slot to (declared type, type its value is known to have);
+    # None is unknown, like a Program input, and a variable that is given an
+    # unknown value is unknown from then on. Inside a function, locals holds
+    # the same for its frame and globals other than the constants are
+    # unknown, since the function may run after they were given any value.
+    def __init__(self, slots:dict=None):
+        self.slots = {} if slots is None else slots
+        for slot, value in enumerate(CONSTANTS.values()):
+            self.slots.setdefault(slot, (FISSION_TYPE_OF[type(value)], FISSION_TYPE_OF[type(value)]))
+        self.locals = None
+        self.function = None
+
+    def table(self, node:Node) -> dict:
+        return self.locals if node.local else self.slots
+
+    def check(self, body:list[Node]):
+        for node in body:
+            self.statement(node)
+
+    def fail(self, node:Node, message:str):
+        raise Error("TypeError",f"{message} (line {node.line})")
+
+    def statement(self, node:Node):
+        if isinstance(node, Declaration):
+            value = self.value(node.value)
+            if not assignable(node.type, value):
+                self.fail(node, f"Cannot assign {article(value)} to the {node.type} variable {node.name}")
+            node.guard = node.type if value is None else None
+            self.table(node)[node.slot] = (node.type, node.type or value)
+        elif isinstance(node, Assignment):
+            value = self.value(node.value)
+            declared, known = self.table(node).get(node.slot, (None, None))
+            if not assignable(declared, value):
+                self.fail(node, f"Cannot assign {article(value)} to the {declared} variable {node.name}")
+            node.guard = declared if value is None else None
+            if declared is None and value != known:
+                self.table(node)[node.slot] = (declared, None)
+        elif isinstance(node, IndexAssignment):
+            if self.index(node.target, node.index) == "string":
+                self.fail(node, "Strings cannot be changed, build a new one instead")
+            value = self.value(node.value)
+            if value not in NUMERIC_TYPES and value is not None:
+                self.fail(node, f"Arrays cannot hold {article(value)}")
+        elif isinstance(node, If):
+            self.condition(node.condition)
+            self.check(node.body)
+            self.check(node.orelse)
+        elif isinstance(node, While):
+            # again until no variable the loop uses lost its type in the body
+            while True:
+                before = dict(self.slots), dict(self.locals or {})
+                self.condition(node.condition)
+                self.check(node.body)
+                if before == (self.slots, self.locals or {}):
+                    break
+        elif isinstance(node, Block):
+            self.check(node.body)
+        elif isinstance(node, ExprStatement):
+            self.expr(node.expr)
+        elif isinstance(node, FunctionDef):
+            self.locals = {}
+            self.function = node
+            for param in node.params:
+                if node.pure is not None and param.type == "array":
+                    self.fail(param, f"The pure function {node.name} cannot take an array")
+                self.locals[param.slot] = (param.type, param.type)
+            try:
+                self.check(node.body)
+            finally:
+                self.locals = None
+                self.function = None
+        elif isinstance(node, Return):
+            value = self.value(node.value)
+            if not assignable(self.function.type, value):
+                self.fail(node, f"{self.function.name} returns {article(self.function.type)}, not {article(value)}")
+            node.guard = self.function.type if value is None else None
+
+    def value(self, node:Node) -> str | None:
+        result = self.expr(node)
+        if result == "none":
+            self.fail(node, f"{node.name} does not return a value")
+        return result
+
+    def condition(self, node:Node):
+        if self.value(node) == "array":
+            self.fail(node, "An array has no single truth value")
+
+    def index(self, target:Node, index:Node) -> str | None:
+        target_type = self.value(target)
+        index_type = self.value(index)
+        if target_type not in ("array", "string", None):
+            self.fail(target, f"Only arrays and strings can be indexed, not {article(target_type)}")
+        if index_type not in ("int", "number", None):
+            self.fail(index, f"Indices must be ints, not {article(index_type)}")
+        return {"array":"number", "string":"string"}.get(target_type)
+
+    def expr(self, node:Node) -> str | None:
+        if isinstance(node, Constant):
+            return FISSION_TYPE_OF.get(type(node.value))
+        if isinstance(node, Name):
+            if self.locals is not None and not node.local and node.slot >= len(CONSTANTS):
+                return None
+            return self.table(node).get(node.slot, (None, None))[1]
+        if isinstance(node, BinaryOp):
+            node.operands = (self.value(node.left), self.value(node.right))
+            return self.operation(node, *node.operands)
+        if isinstance(node, Call):
+            args = [self.value(arg) for arg in node.args]
+            if node.function is not None:
+                return self.call(node, args)
+            builtin = BUILTINS[node.name]
+            for position, arg in enumerate(args):
+                expected = builtin.param(position)
+                if not accepts(expected, arg):
+                    self.fail(node, f"Argument {position + 1} of {node.name} should be {article(expected)}, not {article(arg)}")
+            return builtin.result
+        if isinstance(node, ArrayLiteral):
+            for item in node.items:
+                item_type = self.value(item)
+                if item_type not in NUMERIC_TYPES and item_type is not None:
+                    self.fail(item, f"Arrays cannot hold {article(item_type)}")
+            return "array"
+        if isinstance(node, Index):
+            return self.index(node.target, node.index)
+        if isinstance(node, Slice):
+            target_type = self.value(node.target)
+            if target_type not in ("array", "string", None):
+                self.fail(node, f"Only arrays and strings can be sliced, not {article(target_type)}")
+            for bound in (node.start, node.end):
+                if bound is not None and self.value(bound) not in ("int", "number", None):
+                    self.fail(bound, f"Slice bounds must be ints, not {article(self.value(bound))}")
+            return target_type
+        return None
+
+    def call(self, node:Call, args:list) -> str:
+        # arguments the checker can't vouch for are checked when the call runs
+        guards = []
+        for arg, param in zip(args, node.function.params):
+            if not assignable(param.type, arg):
+                self.fail(node, f"{node.name} takes {article(param.type)} {param.name}, not {article(arg)}")
+            guards.append(param.type if arg is None else None)
+        node.guards = tuple(guards) if any(guards) else None
+        return node.function.type
+
+    def operation(self, node:BinaryOp, left:str | None, right:str | None) -> str | None:
+        if "string" in (left, right):
+            other = right if left == "string" else left
+            if other not in ("string", None):
+                self.fail(node, f"Cannot use {OPERATOR_SYMBOLS[node.op]} on a string and {article(other)}")
+            if node.op in COMPARISON_TYPES:
+                return "bool"
+            if node.op != TT_PLUS:
+                self.fail(node, f"Cannot use {OPERATOR_SYMBOLS[node.op]} on a string")
+            return "string"
+        if "array" in (left, right):
+            other = right if left == "array" else left
+            if other not in NUMERIC_TYPES and other not in ("array", None):
+                self.fail(node, f"Cannot use {OPERATOR_SYMBOLS[node.op]} on an array and {article(other)}")
+            return "array"
+        if left is None or right is None:
+            return None
+        if node.op in COMPARISON_TYPES:
+            return "bool"
+        if node.op == TT_DIVIDE or "float" in (left, right):
+            return "float"
+        if "number" in (left, right):
+            return "number"
+        return "int"
+
+def type_name(value) -> str | None:
+    return "array" if type(value) is Array else FISSION_TYPE_OF.get(type(value))
+
+def check_type(value, expected:str, what:str):
+    # the runtime half of the TypeChecker, for values it couldn't vouch for
+    actual = type_name(value)
+    if not assignable(expected, actual):
+        raise Error("TypeError",f"{what} should be {article(expected)}, not {article(actual)}")
+    return value
+
+class Environment:
+    # Variable storage for one execution: a flat list indexed by slot
+    __slots__ = ("values",)
+    def __init__(self, size:int=0):
+        self.values = [*CONSTANTS.values()]
+        self.ensure(size)
+
+    def ensure(self, size:int):
+        if len(self.values) < size:
+            self.values += [None] * (size - len(self.values))
+
+class Function:
+    # A compiled user function. cache_size is the size of a pure function's
+    # memo table, 0 for a function that isn't pure.
+    __slots__ = ("name", "instructions", "slot_count", "argc", "cache_size")
+    def __init__(self, name:str, instructions:list, slot_count:int, argc:int, cache_size:int=0):
+        self.name = name
+        self.instructions = instructions
+        self.slot_count = slot_count
+        self.argc = argc
+        self.cache_size = cache_size
+
+class Loop:
+    # An innermost while loop the VM can hand to Python once it is hot: the
+    # LOOP_ENTRY instruction in front of the loop holds it. source defines
+    # fission_loop(slots, frame, budget, out, usage), which runs the loop for
+    # at most budget iterations, adds its iterations and the instructions
+    # and builtin calls the VM would have run to usage, and returns
+    # (finished, iterations). guards are the (slot, local) variables that
+    # have to hold numbers for source to be right and exit the pc after the
+    # loop. function and hits are filled in at runtime.
+    __slots__ = ("source", "guards", "exit", "line", "function", "hits")
+    def __init__(self, source:str, guards:tuple, exit:int=0, line:int=0):
+        self.source = source
+        self.guards = guards
+        self.exit = exit
+        self.line = line
+        self.function = None
+        self.hits = 0
+
+    def __repr__(self):
+        return f"loop@{self.line}"
+
+    def compile(self):
+        namespace = python_namespace()
+        exec(builtins.compile(self.source, f"<fission loop@{self.line}>", "exec"), namespace)
+        self.function = namespace["fission_loop"]
+
+    def freeze(self) -> tuple:
+        return (self.source, self.guards, self.exit, self.line)
+
+class Bytecode:
+    # functions is indexed by CALL_FUNCTION; a Session keeps appending to it
+    __slots__ = ("instructions", "slot_count", "functions")
+    def __init__(self, instructions:list, slot_count:int, functions:list=()):
+        self.instructions = instructions
+        self.slot_count = slot_count
+        self.functions = functions
+
+LOAD_CONST = 0
+LOAD_VAR = 1
+STORE_VAR = 2
+BINARY_OP = 3
+COMPARE = 4
+JUMP = 5
+JUMP_IF_FALSE = 6
+JUMP_BACK = 7
+CALL_BUILTIN = 8
+POP = 9
+# only emitted by Compiler(profile=True), so normal runs never see them
+PROFILE_LINE = 10
+PROFILE_ENTER = 11
+PROFILE_EXIT = 12
+BUILD_ARRAY = 13
+LOAD_INDEX = 14
+STORE_INDEX = 15
+# BINARY_OP/COMPARE on operands the TypeChecker proved are numbers
+NUMBER_OP = 16
+NUMBER_DIVIDE = 17
+# a function's parameters and variables live in its frame, not the globals
+LOAD_LOCAL = 18
+STORE_LOCAL = 19
+CALL_FUNCTION = 20
+# arg is the function's name when it ran off its end without a return
+RETURN = 21
+# arg is (type, what): checks a value the TypeChecker couldn't vouch for
+CHECK_TYPE = 22
+LOAD_SLICE = 23
+# arg is a Loop; in front of every loop the VM may run as Python instead
+LOOP_ENTRY = 24
+
+OPCODE_NAMES = ("LOAD_CONST","LOAD_VAR","STORE_VAR","BINARY_OP","COMPARE",
+                "JUMP","JUMP_IF_FALSE","JUMP_BACK","CALL_BUILTIN","POP",
+                "PROFILE_LINE","PROFILE_ENTER","PROFILE_EXIT",
+                "BUILD_ARRAY","LOAD_INDEX","STORE_INDEX","NUMBER_OP","NUMBER_DIVIDE",
+                "LOAD_LOCAL","STORE_LOCAL","CALL_FUNCTION","RETURN","CHECK_TYPE",
+                "LOAD_SLICE","LOOP_ENTRY")
+
+# bump whenever the instruction format changes so stale .fissc files are ignored
+BYTECODE_VERSION = 10
+
+def disassemble(code:Bytecode) -> str:
+    text = "\n".join(f"{pc:>4} {OPCODE_NAMES[op]:<14} {(arg[2], arg[1]) if op == CALL_BUILTIN else arg!r}"
+                     for pc, (op, arg) in enumerate(code.instructions))
+    for index, function in enumerate(code.functions):
+        if function is not None:
+            text += f"\n\nfunction {index} {function.name}\n" + disassemble(Bytecode(function.instructions, 0))
+    return text
+
+# memo entries a pure function keeps when pure isn't given a size
+PURE_CACHE_SIZE = 1024
+
+class Compiler:
+    def __init__(self, optimize:bool=False, profile:bool=False):
+        self.tokens = []
+        self.types = []
+        self.index = 0
+        self.code = []
+        self.optimize = optimize
+        self.profile = profile
+        self.resolver = None
+        # profiled programs are never tiered, their loops have to stay on the VM
+        self.tier = not profile
+        self.costs = None # node -> (instructions, builtin calls) while emitting a tierable loop
+
+    def compile(self, lines:list[list[Token]] | TokenStream, resolver:Resolver=None, types:dict=None) -> Bytecode | Error:
+        try:
+            program = self.lower(lines)
+            if self.optimize:
+                program = Optimizer().optimize(program)
+            self.resolver = resolver or Resolver()
+            slot_count = self.resolver.resolve(program)
+            TypeChecker(types).check(program)
+            self.code = []
+            self.emit_block(program)
+        except Error as error:
+            return error
+        return Bytecode(self.code, slot_count, self.resolver.compiled)
+
+    # --- lowering: token lines -> tree ---
+
+    def lower(self, lines:list[list[Token]] | TokenStream) -> list[Node]:
+        if isinstance(lines, TokenStream):
+            if lines.error is not None:
+                raise lines.error
+            self.tokens = lines
+            self.types = lines.types()
+        else:
+            self.tokens = []
+            for line in lines:
+                self.tokens += line
+                self.tokens.append(Token(TT_NEWLINE,""))
+            self.types = [token.type for token in self.tokens]
+        self.index = 0
+        body = self.block()
+        if self.index < len(self.tokens):
+            raise Error("SyntaxError",f"Unexpected {self.tokens[self.index]}")
+        return body
+
+    def peek(self) -> str | None:
+        if self.index < len(self.types):
+            return self.types[self.index]
+        return None
+
+    def advance(self) -> Token:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, type:str, message:str) -> Token:
+        if self.peek() != type:
+            raise Error("SyntaxError",message)
+        return self.advance()
+
+    def skip_newlines(self):
+        while self.peek() == TT_NEWLINE:
+            self.index += 1
+
+    def block(self) -> list[Node]:
+        body = []
+        self.skip_newlines()
+        while self.index < len(self.tokens) and self.peek() != TT_RCURLY:
+            body.append(self.statement())
+            if self.peek() not in (TT_NEWLINE, TT_RCURLY, None):
+                raise Error("SyntaxError",f"Unexpected {self.tokens[self.index]}")
+            self.skip_newlines()
+        return body
+
+    def braced_block(self) -> list[Node]:
+        self.skip_newlines()
+        self.expect(TT_LCURLY,"Missing { to open the code block")
+        body = self.block()
+        self.expect(TT_RCURLY,"Missing } to close the code block")
+        return body
+
+    def statement(self) -> Node:
+        token = self.tokens[self.index]
+        if token.type == TT_TYPE:
+            self.index += 1
+            name = self.expect(TT_WORD,"function or variable assignment.")
+            if self.peek() == TT_LPAREN:
+                return self.function(token, name)
+            self.expect(TT_ASSIGN,"variable assignment.")
+            return Declaration(token.value, name.value, self.expr()).at(token.line, token.col)
+        if token.type == TT_WORD:
+            if token.value == "pure":
+                # pure or pure(cache size) in front of a function definition
+                self.index += 1
+                size = PURE_CACHE_SIZE
+                if self.peek() == TT_LPAREN:
+                    self.index += 1
+                    size = self.expect(TT_INT,"pure takes the size of its cache").value
+                    self.expect(TT_RPAREN,"Missing the right paren")
+                node = self.statement() if self.peek() == TT_TYPE else None
+                if not isinstance(node, FunctionDef):
+                    raise Error("SyntaxError","pure must come before a function definition")
+                node.pure = size
+                return node
+            if token.value == "return":
+                self.index += 1
+                return Return(self.expr()).at(token.line, token.col)
+            if token.value == "if":
+                self.index += 1
+                condition = self.condition()
+                body = self.braced_block()
+                orelse = []
+                save = self.index
+                self.skip_newlines()
+                if self.peek() == TT_WORD and self.tokens[self.index].value == "else":
+                    self.index += 1
+                    self.skip_newlines()
+                    if self.peek() == TT_WORD and self.tokens[self.index].value == "if":
+                        orelse = [self.statement()]
+                    else:
+                        orelse = self.braced_block()
+                else:
+                    self.index = save
+                return If(condition, body, orelse).at(token.line, token.col)
+            if token.value == "while":
+                self.index += 1
+                condition = self.condition()
+                return While(condition, self.braced_block()).at(token.line, token.col)
+            if token.value == "else":
+                raise Error("SyntaxError","else without an if")
+            if self.index + 1 < len(self.types) and self.types[self.index + 1] == TT_ASSIGN:
+                self.index += 2
+                return Assignment(token.value, self.expr()).at(token.line, token.col)
+        expr = self.expr()
+        if self.peek() == TT_ASSIGN and isinstance(expr, Index):
+            self.index += 1
+            return IndexAssignment(expr.target, expr.index, self.expr()).at(token.line, token.col)
+        return ExprStatement(expr).at(token.line, token.col)
+
+    def function(self, type:Token, name:Token) -> FunctionDef:
+        # type name(type param, ...) { body }
+        self.index += 1
+        params = []
+        while self.peek() != TT_RPAREN:
+            param_type = self.expect(TT_TYPE,"Function parameters need a type")
+            param = self.expect(TT_WORD,"Missing the parameter name")
+            params.append(Declaration(param_type.value, param.value, None).at(param_type.line, param_type.col))
+            if self.peek() != TT_COMMA:
+                break
+            self.index += 1
+        self.expect(TT_RPAREN,"Missing the right paren")
+        return FunctionDef(type.value, name.value, params, self.braced_block()).at(type.line, type.col)
+
+    def condition(self) -> Node:
+        self.expect(TT_LPAREN,"Missing the left paren")
+        node = self.expr()
+        self.expect(TT_RPAREN,"Missing the right paren")
+        return node
+
+    def expr(self) -> Node:
+        node = self.additive()
+        while self.peek() in COMPARISON_TYPES:
+            op = self.advance()
+            node = BinaryOp(node, op.type, self.additive()).at(op.line, op.col)
+        return node
+
+    def additive(self) -> Node:
+        node = self.term()
+        while self.peek() in (TT_PLUS, TT_MINUS):
+            op = self.advance()
+            node = BinaryOp(node, op.type, self.term()).at(op.line, op.col)
+        return node
+
+    def term(self) -> Node:
+        node = self.unary()
+        while self.peek() in (TT_TIMES, TT_DIVIDE):
+            op = self.advance()
+            node = BinaryOp(node, op.type, self.unary()).at(op.line, op.col)
+        return node
+
+    def unary(self) -> Node:
+        if self.peek() == TT_MINUS:
+            minus = self.advance()
+            operand = self.unary()
+            if isinstance(operand, Constant) and type(operand.value) in (int, float):
+                return Constant(-operand.value).at(minus.line, minus.col)
+            return BinaryOp(Constant(0).at(minus.line, minus.col), TT_MINUS, operand).at(minus.line, minus.col)
+        return self.postfix()
+
+    def postfix(self) -> Node:
+        # target[index], or target[start:end] with either bound left out
+        node = self.primary()
+        while self.peek() == TT_LSQUARE:
+            bracket = self.advance()
+            start = None if self.peek() == TT_COLON else self.expr()
+            if self.peek() == TT_COLON:
+                self.index += 1
+                end = None if self.peek() == TT_RSQUARE else self.expr()
+                node = Slice(node, start, end).at(bracket.line, bracket.col)
             else:
-                firstNum = float(firstValue.value)
-            
-            if secondValue.type == TT_BOOL:
-                secondNum = 1.0 if secondValue.value == "true" else 0.0
+                node = Index(node, start).at(bracket.line, bracket.col)
+            self.expect(TT_RSQUARE,"Missing the right bracket")
+        return node
+
+    def items(self, close:str, message:str) -> list[Node]:
+        # comma separated expressions up to the closing token
+        items = []
+        self.skip_newlines()
+        while self.peek() != close:
+            items.append(self.expr())
+            self.skip_newlines()
+            if self.peek() != TT_COMMA:
+                break
+            self.index += 1
+            self.skip_newlines()
+        self.expect(close,message)
+        return items
+
+    def primary(self) -> Node:
+        if self.index >= len(self.tokens):
+            raise Error("SyntaxError","Unexpected end of input")
+        token = self.advance()
+        if token.type in VALUE_TYPES:
+            return Constant(token.value).at(token.line, token.col)
+        if token.type == TT_LPAREN:
+            node = self.expr()
+            self.expect(TT_RPAREN,"Missing the right paren")
+            return node
+        if token.type == TT_LSQUARE:
+            return ArrayLiteral(self.items(TT_RSQUARE,"Missing the right bracket")).at(token.line, token.col)
+        if token.type == TT_WORD:
+            if token.value in ("true", "false"):
+                return Constant(token.value == "true").at(token.line, token.col)
+            if self.peek() == TT_LPAREN:
+                self.index += 1
+                return Call(token.value, self.items(TT_RPAREN,"Missing the right paren")).at(token.line, token.col)
+            return Name(token.value).at(token.line, token.col)
+        raise Error("SyntaxError",f"Unexpected {token}")
+
+    # --- emission: tree -> instructions ---
+
+    def emit(self, op:int, arg=None) -> int:
+        self.code.append((op, arg))
+        return len(self.code) - 1
+
+    def patch(self, at:int, target:int):
+        self.code[at] = (self.code[at][0], target)
+
+    def cost(self, node:Node, start:int):
+        # what the instructions emitted for node since start cost to run
+        if self.costs is not None:
+            self.costs[node] = (len(self.code) - start,
+                                sum(op == CALL_BUILTIN for op, _ in self.code[start:]))
+
+    def emit_block(self, body:list[Node]):
+        for node in body:
+            self.emit_statement(node)
+
+    def emit_statement(self, node:Node):
+        if not self.profile or isinstance(node, (Block, FunctionDef)):
+            self.emit_node(node)
+            return
+        if isinstance(node, While):
+            # the loop marks its own line on every condition check instead
+            self.emit(PROFILE_ENTER, ("while", node.line))
+            self.emit_node(node)
+            self.emit(PROFILE_EXIT, ("while", node.line))
+            return
+        self.emit(PROFILE_LINE, node.line)
+        if isinstance(node, If):
+            self.emit(PROFILE_ENTER, ("if", node.line))
+            self.emit_node(node)
+            self.emit(PROFILE_EXIT, ("if", node.line))
+        else:
+            self.emit_node(node)
+
+    def emit_node(self, node:Node):
+        start = len(self.code)
+        if isinstance(node, (Declaration, Assignment)):
+            self.emit_expr(node.value)
+            if node.guard is not None:
+                self.emit(CHECK_TYPE, (node.guard, f"the value given to {node.name} on line {node.line}"))
+            self.emit(STORE_LOCAL if node.local else STORE_VAR, node.slot)
+            self.cost(node, start)
+        elif isinstance(node, If):
+            self.emit_expr(node.condition)
+            skip = self.emit(JUMP_IF_FALSE)
+            self.cost(node, start)
+            self.emit_block(node.body)
+            if node.orelse:
+                end = self.emit(JUMP)
+                self.patch(skip, len(self.code))
+                self.emit_block(node.orelse)
+                self.patch(end, len(self.code))
             else:
-                secondNum = float(secondValue.value)
-        elif firstValue.type in (TT_INT,TT_BOOL) and secondValue.type in (TT_INT,TT_BOOL):
-            operationType = TT_INT
-            if firstValue.type == TT_BOOL:
-                firstNum = 1 if firstValue.value == "true" else 0
+                self.patch(skip, len(self.code))
+        elif isinstance(node, While):
+            entry = None
+            if self.tier and self.tierable([node.condition] + node.body):
+                # the loop's source is written after its bytecode, which it counts
+                entry = self.emit(LOOP_ENTRY)
+                self.costs = {}
+            start = len(self.code)
+            if self.profile:
+                self.emit(PROFILE_LINE, node.line)
+            self.emit_expr(node.condition)
+            exit = self.emit(JUMP_IF_FALSE)
+            self.cost(node, start)
+            self.emit_block(node.body)
+            self.emit(JUMP_BACK, start)
+            self.patch(exit, len(self.code))
+            if entry is not None:
+                source, guards = LoopTranspiler(self.costs).transpile_loop(node)
+                self.costs = None
+                self.code[entry] = (LOOP_ENTRY, Loop(source, guards, len(self.code), node.line))
+        elif isinstance(node, IndexAssignment):
+            self.emit_expr(node.target)
+            self.emit_expr(node.index)
+            self.emit_expr(node.value)
+            self.emit(STORE_INDEX)
+            self.cost(node, start)
+        elif isinstance(node, Block):
+            self.emit_block(node.body)
+        elif isinstance(node, ExprStatement):
+            self.emit_expr(node.expr)
+            self.emit(POP)
+            self.cost(node, start)
+        elif isinstance(node, FunctionDef):
+            # a function gets its own instruction list; only the top level is profiled
+            code, profile = self.code, self.profile
+            self.code, self.profile = [], False
+            self.emit_block(node.body)
+            self.emit(RETURN, node.name)
+            self.resolver.compiled[node.index] = Function(node.name, self.code, node.slot_count,
+                                                          len(node.params), node.pure or 0)
+            self.code, self.profile = code, profile
+        elif isinstance(node, Return):
+            self.emit_expr(node.value)
+            if node.guard is not None:
+                self.emit(CHECK_TYPE, (node.guard, f"the value returned on line {node.line}"))
+            self.emit(RETURN)
+
+    def tierable(self, node:Node | list) -> bool:
+        # innermost loops that stay in one frame: no nested loops, returns,
+        # calls to user functions or input()
+        if isinstance(node, list):
+            return all(self.tierable(item) for item in node)
+        if isinstance(node, (While, Return)):
+            return False
+        if isinstance(node, Call) and (node.function is not None or node.name == "input"):
+            return False
+        return all(self.tierable(getattr(node, name)) for name in node.__slots__
+                   if isinstance(getattr(node, name), (Node, list)))
+
+    def emit_expr(self, node:Node):
+        if isinstance(node, Constant):
+            self.emit(LOAD_CONST, node.value)
+        elif isinstance(node, Name):
+            self.emit(LOAD_LOCAL if node.local else LOAD_VAR, node.slot)
+        elif isinstance(node, BinaryOp):
+            self.emit_expr(node.left)
+            self.emit_expr(node.right)
+            if node.operands[0] in NUMERIC_TYPES and node.operands[1] in NUMERIC_TYPES:
+                self.emit(NUMBER_DIVIDE if node.op == TT_DIVIDE else NUMBER_OP, node.op)
             else:
-                firstNum = float(firstValue.value)
-            
-            if secondValue.type == TT_BOOL:
-                secondNum = 1 if secondValue.value == "true" else 0
+                self.emit(COMPARE if node.op in COMPARISON_TYPES else BINARY_OP, node.op)
+        elif isinstance(node, Call):
+            if node.function is not None:
+                for position, arg in enumerate(node.args):
+                    self.emit_expr(arg)
+                    if node.guards is not None and node.guards[position] is not None:
+                        param = node.function.params[position].name
+                        self.emit(CHECK_TYPE, (node.guards[position], f"the argument {param} of {node.name}"))
+                self.emit(CALL_FUNCTION, (node.function.index, len(node.args)))
+                return
+            builtin = BUILTINS.get(node.name)
+            if builtin is None:
+                raise Error("FunctionCallError",f"Unknown function {node.name}")
+            for arg in node.args:
+                self.emit_expr(arg)
+            # the function itself, so the VM doesn't look the name up on every call
+            self.emit(CALL_BUILTIN, (builtin.function, len(node.args), node.name))
+        elif isinstance(node, ArrayLiteral):
+            for item in node.items:
+                self.emit_expr(item)
+            self.emit(BUILD_ARRAY, len(node.items))
+        elif isinstance(node, Index):
+            self.emit_expr(node.target)
+            self.emit_expr(node.index)
+            self.emit(LOAD_INDEX)
+        elif isinstance(node, Slice):
+            self.emit_expr(node.target)
+            for bound in (node.start, node.end):
+                if bound is None:
+                    self.emit(LOAD_CONST, None)
+                else:
+                    self.emit_expr(bound)
+            self.emit(LOAD_SLICE)
+
+def fission_print(*args):
+    output.print(*args)
+
+def fission_input(*args) -> str:
+    output.flush()
+    return input(*(format_value(arg) for arg in args))
+
+def fission_asInt(*args) -> int:
+    try:
+        return int(str(args[0]) if type(args[0]) is Text else args[0])
+    except (ValueError, IndexError):
+        raise Error("Conversion Error","Cannot convert to int")
+
+def array_argument(name:str, args:tuple) -> Array:
+    if len(args) != 1 or type(args[0]) is not Array:
+        raise Error("FunctionCallError",f"{name} takes one array")
+    return args[0]
+
+def fission_len(*args) -> int:
+    if len(args) != 1 or type(args[0]) not in (Array, str, Text):
+        raise Error("FunctionCallError","len takes one array or string")
+    return len(args[0])
+
+def fission_range(*args) -> Array:
+    if not 1 <= len(args) <= 3 or any(type(arg) is not int for arg in args):
+        raise Error("FunctionCallError","range takes one to three ints")
+    if len(args) == 3 and args[2] == 0:
+        raise Error("FunctionCallError","range step cannot be 0")
+    if numpy is not None:
+        return Array(numpy.arange(*args, dtype="int64"), TT_INT)
+    return Array(array("q", range(*args)), TT_INT)
+
+def fission_zeros(*args) -> Array:
+    if len(args) != 1 or type(args[0]) is not int or args[0] < 0:
+        raise Error("FunctionCallError","zeros takes one int that is not negative")
+    if numpy is not None:
+        return Array(numpy.zeros(args[0]), TT_FLOAT)
+    return Array(array("d", [0.0]) * args[0], TT_FLOAT)
+
+def fission_sum(*args):
+    values = array_argument("sum", args)
+    if numpy is not None:
+        return values.data.sum().item()
+    return sum(values.data, 0.0 if values.kind == TT_FLOAT else 0)
+
+def fission_min(*args):
+    values = array_argument("min", args)
+    if not len(values):
+        raise Error("ArrayError","min of an empty array")
+    return values.scalar(values.data.min() if numpy is not None else min(values.data))
+
+def fission_max(*args):
+    values = array_argument("max", args)
+    if not len(values):
+        raise Error("ArrayError","max of an empty array")
+    return values.scalar(values.data.max() if numpy is not None else max(values.data))
+
+def fission_find(*args) -> int:
+    # where sub first appears in text, from start on; -1 when it doesn't
+    if not 2 <= len(args) <= 3 or any(type(arg) not in STRING_TYPES for arg in args[:2]) \
+            or (len(args) == 3 and type(args[2]) is not int):
+        raise Error("FunctionCallError","find takes two strings and an optional int start")
+    return str(args[0]).find(str(args[1]), *args[2:])
+
+def fission_join(*args) -> str:
+    # the values with the separator between them; an array adds each element
+    if not args or type(args[0]) not in STRING_TYPES:
+        raise Error("FunctionCallError","join takes a string to put between the values")
+    parts = []
+    for value in args[1:]:
+        if type(value) is Array:
+            parts += [format_value(item) for item in value.values()]
+        else:
+            parts.append(format_value(value))
+    return str(args[0]).join(parts)
+
+def fission_asString(*args) -> str:
+    if len(args) != 1:
+        raise Error("FunctionCallError","asString takes one value")
+    return format_value(args[0])
+
+def fission_mean(*args) -> float:
+    values = array_argument("mean", args)
+    if not len(values):
+        raise Error("ArrayError","mean of an empty array")
+    if numpy is not None:
+        return values.data.mean().item()
+    return sum(values.data) / len(values)
+
+
+# ---------------------------------------------------------------------------
+# Builtin registry
+#
+# Every function a script can call without defining it is a Builtin in
+# BUILTINS. The Resolver checks calls against its arity, the TypeChecker
+# against its parameter and result types, and the Compiler puts the Python
+# function itself into the CALL_BUILTIN instruction, so a call runs it
+# without looking up its name. register() adds functions from the host:
+#
+#   fission.register("sqrt", math.sqrt, ("number",), "float", pure=True)
+# ---------------------------------------------------------------------------
+
+class Builtin:
+    # params has a type for each argument: a type name, a tuple of types
+    # that are all fine, or None for anything; the last one also covers any
+    # further arguments. arity is (fewest, most) with most None for no
+    # limit. Only pure builtins may be called from pure functions.
+    __slots__ = ("name", "function", "params", "result", "arity", "pure")
+    def __init__(self, name:str, function, params:tuple=(), result:str=None, arity=None, pure:bool=True):
+        self.name = name
+        self.function = function
+        self.params = params
+        self.result = result
+        if arity is None:
+            arity = len(params)
+        self.arity = arity if isinstance(arity, tuple) else (arity, arity)
+        self.pure = pure
+
+    def param(self, position:int):
+        return self.params[min(position, len(self.params) - 1)] if self.params else None
+
+    def arity_text(self) -> str:
+        fewest, most = self.arity
+        if most is None:
+            count = f"at least {fewest}"
+        elif fewest == most:
+            count = str(fewest)
+        else:
+            count = f"{fewest} to {most}"
+        plural = not count.endswith(" 1") and count != "1" or " to " in count
+        return f"{count} argument{'s' * plural}"
+
+BUILTINS = {builtin.name: builtin for builtin in (
+    Builtin("print", fission_print, (None,), "none", (0, None), pure=False),
+    Builtin("input", fission_input, (None,), "string", (0, 1), pure=False),
+    Builtin("asInt", fission_asInt, (None,), "int"),
+    Builtin("len", fission_len, (("array", "string"),), "int"),
+    Builtin("range", fission_range, ("int", "int", "int"), "array", (1, 3)),
+    Builtin("zeros", fission_zeros, ("int",), "array"),
+    Builtin("sum", fission_sum, ("array",), "number"),
+    Builtin("min", fission_min, ("array",), "number"),
+    Builtin("max", fission_max, ("array",), "number"),
+    Builtin("mean", fission_mean, ("array",), "float"),
+    Builtin("find", fission_find, ("string", "string", "int"), "int", (2, 3)),
+    Builtin("join", fission_join, ("string", None), "string", (1, None)),
+    Builtin("asString", fission_asString, (None,), "string"),
+)}
+
+# words the Compiler reads as something other than a call
+RESERVED_WORDS = INBUILT_WORDS + INBUILT_TYPES + ("true", "false", "return", "pure")
+
+def register(name:str, function, params:tuple=(), result:str=None, arity=None, pure:bool=False):
+    # Makes a Python function callable from scripts compiled after this;
+    # registering an existing name replaces that builtin. Lists and tuples
+    # it returns become arrays, a result that isn't of the declared type is
+    # a TypeError, and any other exception stops the script with a HostError.
+    # Strings always reach it as str, never as the VM's Text.
+    if not re.fullmatch(r"[A-Za-z]+", name) or name in RESERVED_WORDS:
+        raise ValueError(f"{name!r} cannot be the name of a function")
+    def call(*args):
+        try:
+            value = function(*[str(arg) if type(arg) is Text else arg for arg in args])
+        except Error:
+            raise
+        except Exception as exception:
+            raise Error("HostError",f"{name}: {exception}")
+        if isinstance(value, (list, tuple)):
+            value = make_array(list(value))
+        if result is not None:
+            check_type(value, result, f"The result of {name}")
+        return value
+    BUILTINS[name] = Builtin(name, call, tuple(params), result, arity, pure)
+
+
+class Usage:
+    # What one run used. steps counts VM instructions, iterations loop
+    # back-edges, peak_variables the most variable slots in use at once
+    # (globals other than the constants, plus the locals of the calls
+    # running); peak_memory is only measured when a memory limit is set.
+    __slots__ = ("steps", "iterations", "builtin_calls", "function_calls", "peak_variables", "peak_memory",
+                 "seconds", "started")
+    def __init__(self):
+        self.steps = 0
+        self.iterations = 0
+        self.builtin_calls = 0
+        self.function_calls = 0
+        self.peak_variables = 0
+        self.peak_memory = None
+        self.seconds = 0.0
+        self.started = time.perf_counter()
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__ if name != "started"}
+    def __str__(self):
+        return ", ".join(f"{name}={value}" for name, value in self.as_dict().items())
+
+def variable_memory(values:list) -> int:
+    # bytes held by the variables, counting an array's buffer and a Text's characters
+    return sum(sys.getsizeof(value.data) if type(value) is Array else
+               sys.getsizeof("") + value.length if type(value) is Text else
+               sys.getsizeof(value) for value in values)
+
+class Limits:
+    # Checked every check_every loop iterations or function calls rather
+    # than on every instruction, so a run can go over a limit by up to that
+    # many before it is stopped; the VM checks memory on every one. None
+    # means no limit. The tree-walker only enforces seconds.
+    def __init__(self, steps:int=None, seconds:float=None, memory:int=None, check_every:int=1000):
+        self.steps = steps
+        self.seconds = seconds
+        self.memory = memory
+        self.check_every = check_every
+
+    def check(self, usage:Usage, values:list=None):
+        usage.seconds = time.perf_counter() - usage.started
+        if self.steps is not None and usage.steps > self.steps:
+            raise Error("StepLimitError",f"Ran more than {self.steps} steps")
+        if self.seconds is not None and usage.seconds > self.seconds:
+            raise Error("TimeLimitError",f"Ran longer than {self.seconds} seconds")
+        if self.memory is not None and values is not None:
+            memory = variable_memory(values)
+            usage.peak_memory = max(usage.peak_memory or 0, memory)
+            if memory > self.memory:
+                raise Error("MemoryLimitError",f"Variables hold more than {self.memory} bytes")
+
+# calls nested deeper than this stop the run instead of exhausting memory
+MAX_CALL_DEPTH = 1000
+# loop iterations after which the VM runs a loop as Python; None never does
+TIER_AFTER = 2000
+
+class VirtualMachine:
+    def __init__(self, profiler=None, stdout:Output=None, limits:Limits=None):
+        self.stack = []
+        self.profiler = profiler
+        self.output = stdout or output
+        self.limits = limits or Limits()
+        self.usage = Usage()
+        # execute() returns the pc to resume at after this many loop
+        # iterations, so the limits can be checked (and run_async can yield).
+        # A value can double in size every iteration, so under a memory
+        # limit that is every iteration. With pause_on_input it also returns
+        # at an input() call with the prompt in waiting; the caller pushes
+        # the line it read and resumes.
+        self.slice = 1 if self.limits.memory is not None else self.limits.check_every
+        self.pause_on_input = False
+        self.waiting = None
+        # frames holds (code, pc, frame, function, memo key) for every call
+        # being run; suspended is the (code, frame) execute() returned from
+        # inside a function, so the next execute() carries on there
+        self.functions = ()
+        self.frames = []
+        self.suspended = None
+        self.memos = {}        # function index -> {args: result} for pure functions
+        self.tier_after = TIER_AFTER
+        self.live = 0          # variable slots in use, for usage.peak_variables
+
+    def start(self, code:Bytecode, env:Environment=None) -> Environment:
+        if env is None:
+            env = Environment(code.slot_count)
+        else:
+            env.ensure(code.slot_count)
+        self.functions = code.functions
+        self.frames = []
+        self.suspended = None
+        self.memos = {}
+        self.usage = Usage()
+        self.live = self.usage.peak_variables = len(env.values) - len(CONSTANTS)
+        return env
+
+    def run(self, code:Bytecode, env:Environment=None):
+        if isinstance(code, Error):
+            return code
+        env = self.start(code, env)
+        pc = 0
+        try:
+            while True:
+                pc = self.execute(code.instructions, env, pc)
+                if pc is None:
+                    return None
+                self.output.poll()
+                self.limits.check(self.usage, self.variables(env))
+        except Error as error:
+            self.stack.clear()
+            self.frames.clear()
+            return error
+        except MemoryError:
+            self.stack.clear()
+            self.frames.clear()
+            return Error("MemoryLimitError","Out of memory")
+        finally:
+            self.usage.seconds = time.perf_counter() - self.usage.started
+            self.output.flush()
+            if self.profiler is not None:
+                self.profiler.finish()
+
+    def execute(self, code:list, env:Environment, pc:int=0):
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        slots = env.values
+        operators = OPERATORS
+        numbers = NUMBER_TYPES
+        usage = self.usage
+        ticks = self.slice
+        entered = 0            # ticks used up that aren't back-edges counted here
+        functions = self.functions
+        frames = self.frames
+        frame = None
+        if self.suspended is not None:
+            code, frame = self.suspended
+            self.suspended = None
+        # steps are added up a straight run of instructions at a time, when
+        # a jump is taken, rather than on every instruction
+        run_start = pc
+        if pc and code[pc - 1][0] == LOOP_ENTRY and code[pc - 1][1].function is not None:
+            # back at the start of a compiled loop, enter it through LOOP_ENTRY;
+            # that was counted the first time, so it isn't counted again
+            pc -= 1
+        steps = 0
+        end = len(code)
+        try:
+            while pc < end:
+                op, arg = code[pc]
+                pc += 1
+                if op == LOAD_VAR:
+                    push(slots[arg])
+                elif op == LOAD_CONST:
+                    push(arg)
+                elif op == NUMBER_OP:
+                    right = pop()
+                    push(operators[arg](pop(), right))
+                elif op == BINARY_OP or op == COMPARE:
+                    right = pop()
+                    left = pop()
+                    if type(left) in numbers and type(right) in numbers and (arg != TT_DIVIDE or right != 0):
+                        push(operators[arg](left, right))
+                    else:
+                        push(apply_operator(arg, left, right)) # arrays, or raises the matching Error
+                elif op == JUMP_IF_FALSE:
+                    if not pop():
+                        steps += pc - run_start
+                        pc = run_start = arg
+                elif op == STORE_VAR:
+                    slots[arg] = pop()
+                elif op == JUMP_BACK:
+                    steps += pc - run_start
+                    pc = run_start = arg
+                    ticks -= 1
+                    if not ticks:
+                        self.suspended = (code, frame) if frames else None
+                        if pc and code[pc - 1][0] == LOOP_ENTRY:
+                            self.heat(code[pc - 1][1])
+                        return pc
+                elif op == JUMP:
+                    steps += pc - run_start
+                    pc = run_start = arg
+                elif op == POP:
+                    pop()
+                elif op == LOAD_LOCAL:
+                    push(frame[arg])
+                elif op == STORE_LOCAL:
+                    frame[arg] = pop()
+                elif op == CALL_FUNCTION:
+                    index, argc = arg
+                    function = functions[index]
+                    args = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc:]
+                    usage.function_calls += 1
+                    key = None
+                    if function.cache_size:
+                        # a pure function's result only depends on its arguments
+                        memo = self.memos.setdefault(index, {})
+                        key = tuple(args)
+                        if key in memo:
+                            result = memo.pop(key)
+                            memo[key] = result
+                            push(result)
+                            continue
+                    if len(frames) >= MAX_CALL_DEPTH:
+                        raise Error("RecursionError",f"Calls nested more than {MAX_CALL_DEPTH} deep")
+                    steps += pc - run_start
+                    frames.append((code, pc, frame, index, key))
+                    code = function.instructions
+                    end = len(code)
+                    frame = args
+                    if function.slot_count > argc:
+                        frame += [None] * (function.slot_count - argc)
+                    self.live += len(frame)
+                    if self.live > usage.peak_variables:
+                        usage.peak_variables = self.live
+                    pc = run_start = 0
+                    # calls use up the slice too, or recursion would never
+                    # hand back to have the limits checked
+                    ticks -= 1
+                    entered += 1
+                    if not ticks:
+                        self.suspended = (code, frame)
+                        return pc
+                elif op == RETURN:
+                    if arg is not None:
+                        raise Error("FunctionError",f"{arg} ended without returning a value")
+                    steps += pc - run_start
+                    self.live -= len(frame)
+                    code, pc, frame, index, key = frames.pop()
+                    end = len(code)
+                    run_start = pc
+                    if key is not None:
+                        memo = self.memos[index]
+                        memo[key] = stack[-1]
+                        if len(memo) > functions[index].cache_size:
+                            del memo[next(iter(memo))]
+                elif op == CHECK_TYPE:
+                    check_type(stack[-1], *arg)
+                elif op == LOOP_ENTRY:
+                    if arg.function is not None and self.tier_after is not None:
+                        result = self.run_loop(arg, slots, frame, ticks)
+                        if result is not None:
+                            finished, count = result
+                            ticks -= count
+                            entered += count # the loop added its iterations itself
+                            steps += pc - run_start
+                            if finished:
+                                pc = run_start = arg.exit
+                            else:
+                                # out of iterations for this slice, like a back-edge would be
+                                run_start = pc
+                                self.suspended = (code, frame) if frames else None
+                                return pc
+                elif op == CALL_BUILTIN:
+                    function, argc, _ = arg
+                    args = stack[len(stack) - argc:]
+                    del stack[len(stack) - argc:]
+                    usage.builtin_calls += 1
+                    if function is fission_print:
+                        push(self.output.print(*args))
+                    elif function is fission_input:
+                        if self.pause_on_input:
+                            self.waiting = args
+                            self.suspended = (code, frame) if frames else None
+                            return pc
+                        # the prompt has to come after what this run printed
+                        self.output.flush()
+                        push(function(*args))
+                    else:
+                        push(function(*args))
+                elif op == NUMBER_DIVIDE:
+                    right = pop()
+                    if right == 0:
+                        raise Error("DivisionWithZeroError","Cannot do division with 0")
+                    push(pop() / right)
+                elif op == LOAD_INDEX:
+                    index = pop()
+                    push(index_value(pop(), index))
+                elif op == STORE_INDEX:
+                    value = pop()
+                    index = pop()
+                    store_index(pop(), index, value)
+                elif op == LOAD_SLICE:
+                    stop = pop()
+                    start = pop()
+                    push(slice_value(pop(), start, stop))
+                elif op == BUILD_ARRAY:
+                    items = stack[len(stack) - arg:]
+                    del stack[len(stack) - arg:]
+                    push(make_array(items))
+                elif op == PROFILE_LINE:
+                    self.profiler.line(arg)
+                elif op == PROFILE_ENTER:
+                    self.profiler.enter(arg)
+                elif op == PROFILE_EXIT:
+                    self.profiler.exit(arg)
+            return None
+        finally:
+            usage.steps += steps + pc - run_start
+            usage.iterations += self.slice - ticks - entered
+
+    def variables(self, env:Environment) -> list:
+        # the globals and the locals of every call still running
+        values = list(env.values)
+        for _, _, frame, _, _ in self.frames:
+            if frame is not None:
+                values += frame
+        if self.suspended is not None and self.suspended[1] is not None:
+            values += self.suspended[1]
+        return values
+
+    def heat(self, loop:Loop):
+        # Iterations are counted a slice at a time, when execute() hands back
+        # at the start of the loop that used up the slice, so counting costs
+        # nothing per iteration.
+        loop.hits += self.slice
+        if self.tier_after is not None and loop.function is None and loop.source is not None \
+                and loop.hits >= self.tier_after:
+            try:
+                loop.compile()
+            except Exception:
+                loop.source = None # stays on the VM
+
+    def run_loop(self, loop:Loop, slots:list, frame:list, budget:int) -> tuple[bool, int] | None:
+        # None when a guard fails and the loop has to be interpreted this time
+        for slot, local in loop.guards:
+            if type(frame[slot] if local else slots[slot]) not in NUMBER_TYPES:
+                return None
+        try:
+            return loop.function(slots, frame, budget, self.output, self.usage)
+        except ZeroDivisionError:
+            raise Error("DivisionWithZeroError","Cannot do division with 0")
+
+
+class Profiler:
+    # Fed by the PROFILE_* instructions of a Compiler(profile=True) program.
+    # The time between two events is charged to the line that was running,
+    # and to the stack of if/while blocks around it for collapsed stacks.
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.counts = {}       # line -> times executed
+        self.self_time = {}    # line -> seconds spent on the line itself
+        self.blocks = {}       # (kind, line) -> [times entered, cumulative seconds]
+        self.stacks = {}       # (blocks..., line) -> seconds
+        self.open = []         # [(block, started)] for the blocks being run
+        self.frames = ()
+        self.current = None
+        self.last = clock()
+
+    def charge(self, now:float):
+        if self.current is not None:
+            elapsed = now - self.last
+            self.self_time[self.current] = self.self_time.get(self.current, 0.0) + elapsed
+            key = self.frames + (self.current,)
+            self.stacks[key] = self.stacks.get(key, 0.0) + elapsed
+        self.last = now
+
+    def line(self, line:int):
+        self.charge(self.clock())
+        self.current = line
+        self.counts[line] = self.counts.get(line, 0) + 1
+
+    def enter(self, block:tuple):
+        now = self.clock()
+        self.charge(now)
+        self.open.append((block, now))
+        self.frames += (block,)
+        self.current = block[1]
+        stats = self.blocks.setdefault(tuple(block), [0, 0.0])
+        stats[0] += 1
+
+    def exit(self, block:tuple):
+        now = self.clock()
+        self.charge(now)
+        block, started = self.open.pop()
+        self.frames = self.frames[:-1]
+        self.blocks[tuple(block)][1] += now - started
+        self.current = None
+
+    def finish(self):
+        self.charge(self.clock())
+        self.current = None
+
+    def report(self, source:str="", limit:int=20) -> str:
+        text = source.split("\n")
+        cumulative = dict(self.self_time)
+        kinds = {}
+        for (kind, line), (_, seconds) in self.blocks.items():
+            cumulative[line] = max(cumulative.get(line, 0.0), seconds)
+            kinds[line] = kind
+        rows = sorted(self.counts, key=lambda line: self.self_time.get(line, 0.0), reverse=True)[:limit]
+        output = [f"{'line':>6} {'count':>10} {'self ms':>10} {'cum ms':>10}  source"]
+        for line in rows:
+            code = text[line - 1].strip() if 0 < line <= len(text) else ""
+            if line in kinds:
+                code += f"   [{kinds[line]}]"
+            output.append(f"{line:>6} {self.counts[line]:>10} {self.self_time.get(line, 0.0) * 1000:>10.3f} "
+                          f"{cumulative.get(line, 0.0) * 1000:>10.3f}  {code}")
+        return "\n".join(output)
+
+    def collapsed(self) -> str:
+        # one "main;while@3;if@5;line 6 <microseconds>" row per stack, the
+        # folded format flamegraph.pl and speedscope read
+        rows = []
+        for key, seconds in self.stacks.items():
+            frames = ["main"] + [f"{kind}@{line}" for kind, line in key[:-1]] + [f"line {key[-1]}"]
+            rows.append(f"{';'.join(frames)} {round(seconds * 1_000_000)}")
+        return "\n".join(rows) + "\n"
+
+
+class Session:
+    # One long-lived environment for the REPL. Each input is compiled on its
+    # own against the global names declared so far, and compiled inputs are
+    # kept so pasting the same block again skips lexing and compiling.
+    CACHE_SIZE = 256
+
+    def __init__(self, optimize:bool=False, redeclare:bool=True, limits:Limits=None):
+        self.optimize = optimize
+        self.resolver = Resolver(redeclare)
+        self.env = Environment(self.resolver.slot_count)
+        self.vm = VirtualMachine(limits=limits)
+        self.types = {}
+        self.cache = {}
+
+    def compile(self, text:str) -> Bytecode | Error:
+        # Inner blocks take slots after the globals, so a compiled input is
+        # only reusable while no new global has been declared since. Code is
+        # also specialized on the globals' types and the functions' signatures:
+        # an input that changes a type or redefines a function empties the
+        # cache and isn't cached itself, so every cached input was compiled
+        # against the types and functions as they are now.
+        key = (text, self.resolver.next_slot)
+        code = self.cache.get(key)
+        if code is not None:
+            return code
+        scope = dict(self.resolver.scopes[0])
+        next_slot = self.resolver.next_slot
+        functions = dict(self.resolver.functions)
+        compiled = list(self.resolver.compiled)
+        types = dict(self.types)
+        code = Compiler(self.optimize).compile(scan(text), self.resolver, self.types)
+        if isinstance(code, Error):
+            self.resolver.scopes = [scope]
+            self.resolver.next_slot = next_slot
+            self.resolver.functions = functions
+            self.resolver.compiled[:] = compiled
+            self.types.clear()
+            self.types.update(types)
+            return code
+        if any(self.types[slot] != type for slot, type in types.items()) \
+                or any(self.resolver.functions[name] is not node for name, node in functions.items()):
+            self.cache.clear()
+            return code
+        self.cache[key] = code
+        if len(self.cache) > self.CACHE_SIZE:
+            del self.cache[next(iter(self.cache))]
+        return code
+
+    def run(self, text:str):
+        known = set(self.resolver.scopes[0])
+        code = self.compile(text)
+        result = self.vm.run(code, self.env)
+        if isinstance(result, Error) and not isinstance(code, Error):
+            # forget globals this input declared but never got to assign
+            forgotten = [name for name in set(self.resolver.scopes[0]) - known
+                         if self.env.values[self.resolver.scopes[0][name]] is None]
+            for name in forgotten:
+                del self.resolver.scopes[0][name]
+            if forgotten:
+                self.cache = {key: cached for key, cached in self.cache.items() if cached is not code}
+        return result
+
+
+
+# ---------------------------------------------------------------------------
+# Prepared programs
+#
+# fission.compile() does the lexing, parsing and slot assignment once. The
+# Program it returns can be run any number of times, from any number of
+# threads, each run on its own fresh Environment and with its own output
+# buffer. What it does never changes; the one thing runs share is the hot
+# loops the VM has compiled to Python, which every later run reuses.
+# ---------------------------------------------------------------------------
+
+class Program:
+    __slots__ = ("code", "names", "inputs")
+    def __init__(self, code:Bytecode, names:dict, inputs:tuple):
+        functions = tuple(Function(function.name, tuple(function.instructions), function.slot_count,
+                                   function.argc, function.cache_size) for function in code.functions)
+        code = Bytecode(tuple(code.instructions), code.slot_count, functions)
+        object.__setattr__(self, "code", code)
+        object.__setattr__(self, "names", MappingProxyType(dict(names)))
+        object.__setattr__(self, "inputs", inputs)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Program is immutable")
+
+    def environment(self) -> Environment:
+        return Environment(self.code.slot_count)
+
+    def run(self, inputs:dict=None, env:Environment=None, limits:Limits=None, stdout:Output=None) -> dict | Error:
+        # Returns the program's top-level variables, or the Error it stopped with
+        inputs = inputs or {}
+        missing = [name for name in self.inputs if name not in inputs]
+        if missing:
+            return Error("InputError",f"Missing input: {', '.join(missing)}")
+        env = env or self.environment()
+        for name, value in inputs.items():
+            if name not in self.inputs:
+                return Error("InputError",f"{name} is not an input of this program")
+            if isinstance(value, (list, tuple)):
+                try:
+                    value = make_array(list(value))
+                except Error as error:
+                    return Error("InputError",f"{name}: {error.body}")
+            if type_name(value) is None:
+                return Error("InputError",f"{name} cannot be {type(value).__name__}, only int, float, bool, string or a list")
+            env.values[self.names[name]] = value
+        if stdout is None:
+            # the shared output's buffer isn't safe to fill from several threads
+            stdout = Output(output.sink, output.buffer_size, output.flush_interval)
+        result = VirtualMachine(stdout=stdout, limits=limits).run(self.code, env)
+        if isinstance(result, Error):
+            return result
+        return {name: str(env.values[slot]) if type(env.values[slot]) is Text else env.values[slot]
+                for name, slot in self.names.items() if name not in CONSTANTS}
+
+def compile(source:str, inputs:tuple=(), optimize:bool=False) -> Program | Error:
+    # inputs names the variables run() fills in, which the source uses
+    # without declaring them
+    resolver = Resolver()
+    for name in inputs:
+        resolver.declare(name)
+    code = Compiler(optimize).compile(scan(source), resolver)
+    if isinstance(code, Error):
+        return code
+    return Program(code, resolver.scopes[0], tuple(inputs))
+
+
+# ---------------------------------------------------------------------------
+# Streaming execution
+#
+# For huge generated scripts and for scripts piped in on stdin: lines are
+# read lazily, cut into complete top-level statements (a whole { } block
+# counts as one) and each statement runs in a Session as soon as it is
+# complete. Memory is bounded by the largest block, not the file.
+# ---------------------------------------------------------------------------
+
+STREAM_PATTERN = re.compile(r"[\"'{}]")
+BLOCK_PATTERN = re.compile(r"\s*(if|while)(?![A-Za-z])")
+CONTINUE_PATTERN = re.compile(r"\s*(else(?![A-Za-z])|{)")
+
+def read_lines(path:str, use_mmap:bool=False):
+    if path == "-":
+        yield from sys.stdin
+        return
+    if not use_mmap:
+        with open(path,"r") as f:
+            yield from f
+        return
+    with open(path,"rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b""):
+                yield line.decode()
+
+def split_statements(lines):
+    # yields source text one complete top-level statement at a time
+    pending = []
+    held = None    # an if/while that an `else` or `{` on a later line may still extend
+    depth = 0
+    quote = None
+    for line in lines:
+        if held is not None:
+            if not line.strip():
+                held.append(line)
+                continue
+            if CONTINUE_PATTERN.match(line):
+                pending = held
+            else:
+                yield "".join(held)
+            held = None
+        pending.append(line)
+        for match in STREAM_PATTERN.finditer(line):
+            char = match.group()
+            if quote is not None:
+                if char == quote:
+                    quote = None
+            elif char == '"' or char == "'":
+                quote = char
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+        if depth <= 0 and quote is None:
+            depth = 0
+            if BLOCK_PATTERN.match(pending[0]):
+                held = pending
+            else:
+                yield "".join(pending)
+            pending = []
+    if held is not None:
+        yield "".join(held)
+    if pending:
+        yield "".join(pending)
+
+def run_stream(lines, session:Session=None, group:int=1):
+    # group > 1 runs several consecutive statements per compile, which costs
+    # a little latency but far less per-statement overhead on big files
+    session = session or Session(redeclare=False)
+    chunk = []
+    for statement in split_statements(lines):
+        chunk.append(statement)
+        if len(chunk) >= group:
+            result = session.run("".join(chunk))
+            chunk = []
+            if result is not None:
+                return result
+    if chunk:
+        return session.run("".join(chunk))
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Async embedding
+#
+# run_async runs a program as a coroutine on the caller's event loop. The VM
+# hands control back every yield_every loop iterations and at every input(),
+# so one long loop can't starve the other scripts sharing the loop, and
+# input waits on its stream instead of blocking the loop.
+# ---------------------------------------------------------------------------
+
+class StreamOutput(Output):
+    # An Output whose sink is an asyncio.StreamWriter: text is encoded for
+    # write() and drain() is awaited whenever the script yields.
+    def __init__(self, writer, buffer_size:int=8192):
+        super().__init__(writer, buffer_size, flush_interval=float("inf"))
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if self.parts:
+            text = "".join(self.parts)
+            self.parts.clear()
+            self.size = 0
+            self.sink.write(text.encode())
+
+    async def drain(self):
+        self.flush()
+        await self.sink.drain()
+
+async def read_line(stdin) -> str:
+    # stdin is an asyncio.StreamReader or anything with a readline(), like
+    # io.StringIO; None reads the process's stdin in a worker thread
+    if stdin is None:
+        import asyncio
+        line = await asyncio.get_running_loop().run_in_executor(None, sys.stdin.readline)
+    else:
+        line = stdin.readline()
+        if hasattr(line, "__await__"):
+            line = await line
+    if isinstance(line, bytes):
+        line = line.decode()
+    if not line:
+        raise Error("InputError","No more input")
+    return line.rstrip("\n")
+
+async def run_async(program, stdin=None, stdout=None, env:Environment=None, yield_every:int=1000,
+                    limits:Limits=None):
+    # program is source text or Bytecode; stdout is an asyncio.StreamWriter,
+    # a text stream or None for the process's stdout
+    import asyncio # takes as long to import as this whole module, so only here
+    code = compile_source(program) if isinstance(program, str) else program
+    if isinstance(code, Error):
+        return code
+    if stdout is not None and hasattr(stdout, "drain"):
+        channel = StreamOutput(stdout)
+    else:
+        channel = Output(stdout, flush_interval=float("inf"))
+    vm = VirtualMachine(stdout=channel, limits=limits)
+    vm.slice = yield_every
+    vm.pause_on_input = True
+    env = vm.start(code, env)
+    pc = 0
+    try:
+        while True:
+            pc = vm.execute(code.instructions, env, pc)
+            prompt = vm.waiting
+            vm.waiting = None
+            if prompt is not None:
+                channel.write("".join(format_value(arg) for arg in prompt))
+            if isinstance(channel, StreamOutput):
+                await channel.drain()
             else:
-                secondNum = int(secondValue.value)
-        if firstNum == None and secondNum == None:
-            return Error("SyntaxError"," Syntax")
-        if middleValue.type == TT_PLUS:
-            return Token(operationType,str(firstNum+secondNum))
-        elif middleValue.type == TT_MINUS:
-            return Token(operationType,str(firstNum-secondNum))
-        elif middleValue.type == TT_TIMES:
-            return Token(operationType,str(firstNum*secondNum))
-        elif middleValue.type == TT_DIVIDE:
-            if firstNum == 0 or secondNum == 0:
-                return Error("DivisionWithZeroError","Cannot do division with 0")
-            return Token(operationType,str(firstNum/secondNum))
-        elif middleValue.type == TT_EQ:
-            return Token(TT_BOOL,str(firstNum == secondNum))
-        elif middleValue.type == TT_NE:
-            return Token(TT_BOOL,str(firstNum != secondNum))
-        elif middleValue.type == TT_GT:
-            return Token(TT_BOOL,str(firstNum > secondNum))
-        elif middleValue.type == TT_GTE:
-            return Token(TT_BOOL,str(firstNum >= secondNum))
-        elif middleValue.type == TT_LT:
-            return Token(TT_BOOL,str(firstNum <= secondNum))
-        elif middleValue.type == TT_LTE:
-            return Token(TT_BOOL,str(firstNum <= secondNum))
\ No newline at end of file
+                channel.flush()
+            if pc is None:
+                return None
+            vm.limits.check(vm.usage, vm.variables(env))
+            if prompt is not None:
+                vm.stack.append(await read_line(stdin))
+            else:
+                await asyncio.sleep(0)
+    except Error as error:
+        vm.stack.clear()
+        vm.frames.clear()
+        return error
+    finally:
+        vm.usage.seconds = time.perf_counter() - vm.usage.started
+        channel.flush()
+
+
+# ---------------------------------------------------------------------------
+# Compiled-program cache
+#
+# Like __pycache__: compiling foo.fiss stores the bytecode in
+# __fisscache__/foo.fissc next to it. An entry is only used when its source
+# hash, bytecode version and Python version all match, so editing the script
+# or upgrading the interpreter invalidates it without any bookkeeping.
+# ---------------------------------------------------------------------------
+
+CACHE_DIR = "__fisscache__"
+CACHE_MAGIC = b"FISC"
+
+def cache_path(path:str, optimize:bool=False) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    suffix = ".opt.fissc" if optimize else ".fissc"
+    return os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0] + suffix)
+
+def compile_source(text:str, optimize:bool=False, profile:bool=False) -> Bytecode | Error:
+    lex = Lexer(text,fast=True)
+    lex.make_tokens()
+    return Compiler(optimize,profile).compile(lex.stream)
+
+def compile_file(path:str, use_cache:bool=True, optimize:bool=False) -> Bytecode | Error:
+    with open(path,"rb") as f:
+        source = f.read()
+    key = (CACHE_MAGIC, BYTECODE_VERSION, optimize, sys.version_info[:2], hashlib.sha256(source).digest())
+    if use_cache:
+        code = read_cache(cache_path(path, optimize), key)
+        if code is not None:
+            return code
+    code = compile_source(source.decode(), optimize)
+    if use_cache and not isinstance(code, Error):
+        write_cache(cache_path(path, optimize), key, code)
+    return code
+
+def read_cache(path:str, key:tuple) -> Bytecode | None:
+    try:
+        with open(path,"rb") as f:
+            entry = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if type(entry) is not tuple or len(entry) != 4 or entry[0] != key:
+        return None
+    instructions = link(entry[1])
+    functions = [Function(name, link(code), *rest) for name, code, *rest in entry[3]]
+    if instructions is None or None in [function.instructions for function in functions]:
+        return None # calls a builtin that hasn't been registered in this process
+    return Bytecode(instructions, entry[2], functions)
+
+def unlink(instructions:list) -> list:
+    # marshal can't store objects, so cached builtin calls keep only the
+    # name and loops their tuple
+    unlinked = []
+    for op, arg in instructions:
+        if op == CALL_BUILTIN:
+            arg = (arg[2], arg[1])
+        elif op == LOOP_ENTRY:
+            arg = arg.freeze()
+        unlinked.append((op, arg))
+    return unlinked
+
+def link(instructions:list) -> list | None:
+    linked = []
+    for op, arg in instructions:
+        if op == CALL_BUILTIN:
+            builtin = BUILTINS.get(arg[0])
+            if builtin is None:
+                return None
+            arg = (builtin.function, arg[1], arg[0])
+        elif op == LOOP_ENTRY:
+            arg = Loop(*arg)
+        linked.append((op, arg))
+    return linked
+
+def write_cache(path:str, key:tuple, code:Bytecode):
+    # write to a temp file in the same directory and rename it over the old
+    # entry, so a concurrent reader sees either the old file or the new one
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    except OSError:
+        return # read-only location, just run uncached
+    try:
+        with os.fdopen(fd,"wb") as f:
+            functions = tuple((function.name, unlink(function.instructions), function.slot_count,
+                               function.argc, function.cache_size) for function in code.functions)
+            marshal.dump((key, unlink(code.instructions), code.slot_count, functions), f)
+        os.replace(temp, path)
+    except (OSError, ValueError):
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Python backend
+#
+# Translates the resolved tree into Python source: declarations become
+# assignments to locals of one function, if/while become Python control
+# flow, user functions become functions nested in it (lru_cache'd when
+# pure) and builtins call the fission_* helpers. The source goes through
+# compile() once, after which CPython's own evaluator runs the loops.
+# ---------------------------------------------------------------------------
+
+PYTHON_OPERATORS = {TT_PLUS:"+", TT_MINUS:"-", TT_TIMES:"*", TT_DIVIDE:"/", TT_EQ:"==",
+                    TT_NE:"!=", TT_LT:"<", TT_LTE:"<=", TT_GT:">", TT_GTE:">="}
+
+PYTHON_HELPERS = {"apply_operator":apply_operator, "make_array":make_array,
+                  "index_value":index_value, "store_index":store_index, "slice_value":slice_value,
+                  "check_type":check_type, "lru_cache":lru_cache, "Error":Error}
+
+class Transpiler:
+    def __init__(self, optimize:bool=False):
+        self.lines = []
+        self.helper_slots = set()
+        self.optimize = optimize
+
+    def transpile(self, lines:list[list[Token]] | TokenStream) -> str | Error:
+        try:
+            program = Compiler().lower(lines)
+            if self.optimize:
+                program = Optimizer().optimize(program)
+            Resolver().resolve(program)
+            TypeChecker().check(program)
+            self.find_helper_slots(program)
+            self.lines = ["def fission_main():"]
+            for slot, (name, value) in enumerate(CONSTANTS.items()):
+                self.lines.append(f"    {name}_{slot} = {value!r}")
+            for node in program:
+                if isinstance(node, FunctionDef):
+                    self.function(node, 1)
+            self.block(program, 1)
+        except Error as error:
+            return error
+        return "\n".join(self.lines) + "\n"
+
+    def find_helper_slots(self, program:list[Node]):
+        # Python's + and == accept strings where Fission raises, and arrays
+        # work element-wise, so any operation that might see a string or an
+        # array goes through apply_operator. Everything else becomes a native
+        # operator.
+        # Locals of different functions can share a Python name, which only
+        # ever sends more of them through apply_operator.
+        stores = []
+        def collect(body):
+            for node in body:
+                if isinstance(node, (Declaration, Assignment)):
+                    stores.append(node)
+                elif isinstance(node, If):
+                    collect(node.body)
+                    collect(node.orelse)
+                elif isinstance(node, (While, Block)):
+                    collect(node.body)
+                elif isinstance(node, FunctionDef):
+                    stores.extend(node.params)
+                    collect(node.body)
+        collect(program)
+        self.helper_slots = {self.variable(node) for node in stores
+                             if isinstance(node, Declaration) and node.type in ("string", "array")}
+        changed = True
+        while changed:
+            changed = False
+            for node in stores:
+                if self.variable(node) not in self.helper_slots and node.value is not None and self.needs_helper(node.value):
+                    self.helper_slots.add(self.variable(node))
+                    changed = True
+
+    def variable(self, node:Name | Declaration | Assignment) -> str:
+        return f"{node.name}_l{node.slot}" if node.local else f"{node.name}_{node.slot}"
+
+    def needs_helper(self, node:Node) -> bool:
+        if isinstance(node, Constant):
+            return type(node.value) is str
+        if isinstance(node, Name):
+            return self.variable(node) in self.helper_slots
+        if isinstance(node, Call):
+            if node.function is not None:
+                return node.function.type in ("string", "array")
+            # Python's own operators can only be trusted with a numeric result
+            return BUILTINS[node.name].result not in NUMERIC_TYPES
+        if isinstance(node, (ArrayLiteral, Slice)):
+            return True
+        if isinstance(node, Index):
+            return self.needs_helper(node.target)
+        if isinstance(node, BinaryOp):
+            return self.needs_helper(node.left) or self.needs_helper(node.right)
+        return False
+
+    def block(self, body:list[Node], depth:int):
+        if not body:
+            self.lines.append("    " * depth + "pass")
+        for node in body:
+            self.statement(node, depth)
+
+    def function(self, node:FunctionDef, depth:int):
+        indent = "    " * depth
+        assigned = set()
+        def collect(body):
+            for statement in body:
+                if isinstance(statement, Assignment) and not statement.local:
+                    assigned.add(self.variable(statement))
+                elif isinstance(statement, If):
+                    collect(statement.body)
+                    collect(statement.orelse)
+                elif isinstance(statement, (While, Block)):
+                    collect(statement.body)
+        collect(node.body)
+        if node.pure is not None:
+            self.lines.append(f"{indent}@lru_cache(maxsize={node.pure})")
+        self.lines.append(f"{indent}def fn_{node.name}({', '.join(self.variable(param) for param in node.params)}):")
+        if assigned:
+            self.lines.append(f"{indent}    nonlocal {', '.join(sorted(assigned))}")
+        self.block(node.body, depth + 1)
+        if not node.body or not isinstance(node.body[-1], Return):
+            self.lines.append(f"{indent}    raise Error('FunctionError', '{node.name} ended without returning a value')")
+
+    def statement(self, node:Node, depth:int):
+        indent = "    " * depth
+        if isinstance(node, (Declaration, Assignment)):
+            value = self.expr(node.value)
+            if node.guard is not None:
+                value = f"check_type({value}, {node.guard!r}, 'the value given to {node.name} on line {node.line}')"
+            self.lines.append(f"{indent}{self.variable(node)} = {value}")
+        elif isinstance(node, IndexAssignment):
+            self.lines.append(f"{indent}store_index({self.expr(node.target)}, {self.expr(node.index)}, {self.expr(node.value)})")
+        elif isinstance(node, If):
+            self.lines.append(f"{indent}if {self.expr(node.condition)}:")
+            self.block(node.body, depth + 1)
+            if node.orelse:
+                self.lines.append(f"{indent}else:")
+                self.block(node.orelse, depth + 1)
+        elif isinstance(node, While):
+            self.lines.append(f"{indent}while {self.expr(node.condition)}:")
+            self.block(node.body, depth + 1)
+        elif isinstance(node, Block):
+            self.block(node.body, depth)
+        elif isinstance(node, ExprStatement):
+            self.lines.append(f"{indent}{self.expr(node.expr)}")
+        elif isinstance(node, Return):
+            value = self.expr(node.value)
+            if node.guard is not None:
+                value = f"check_type({value}, {node.guard!r}, 'the value returned on line {node.line}')"
+            self.lines.append(f"{indent}return {value}")
+
+    def expr(self, node:Node) -> str:
+        if isinstance(node, Constant):
+            return repr(node.value)
+        if isinstance(node, Name):
+            return self.variable(node)
+        if isinstance(node, BinaryOp):
+            left = self.expr(node.left)
+            right = self.expr(node.right)
+            numbers = node.operands[0] in NUMERIC_TYPES and node.operands[1] in NUMERIC_TYPES
+            if not numbers and (self.needs_helper(node.left) or self.needs_helper(node.right)):
+                return f"apply_operator({node.op!r}, {left}, {right})"
+            return f"({left} {PYTHON_OPERATORS[node.op]} {right})"
+        if isinstance(node, Call):
+            if node.function is not None:
+                args = [self.expr(arg) for arg in node.args]
+                for position, guard in enumerate(node.guards or ()):
+                    if guard is not None:
+                        what = f"the argument {node.function.params[position].name} of {node.name}"
+                        args[position] = f"check_type({args[position]}, {guard!r}, {what!r})"
+                return f"fn_{node.name}({', '.join(args)})"
+            if node.name not in BUILTINS:
+                raise Error("FunctionCallError",f"Unknown function {node.name}")
+            return f"fission_{node.name}({', '.join(self.expr(arg) for arg in node.args)})"
+        if isinstance(node, ArrayLiteral):
+            return f"make_array([{', '.join(self.expr(item) for item in node.items)}])"
+        if isinstance(node, Index):
+            return f"index_value({self.expr(node.target)}, {self.expr(node.index)})"
+        if isinstance(node, Slice):
+            bounds = [("None" if bound is None else self.expr(bound)) for bound in (node.start, node.end)]
+            return f"slice_value({self.expr(node.target)}, {bounds[0]}, {bounds[1]})"
+
+class LoopTranspiler(Transpiler):
+    # Writes one innermost loop as the fission_loop function of a Loop. An
+    # operation is native when the TypeChecker proved both operands are
+    # numbers, or when an operand it couldn't type is a variable the loop
+    # never assigns: the VM checks that variable holds a number (a guard)
+    # every time it enters the compiled loop. Anything else goes through
+    # apply_operator, like the VM's BINARY_OP does.
+    # costs holds what each statement, if condition and the loop condition
+    # take on the VM, from the Compiler. Every block adds up what its own
+    # statements cost as it starts, so the usage counters come out the same
+    # as if the VM had run the loop; only a run that stops with an error
+    # inside the loop is charged the rest of the block it stopped in.
+    def __init__(self, costs:dict):
+        super().__init__()
+        self.assigned = set()
+        self.guards = set()
+        self.costs = costs
+        self.entry_costs = {} # id of a block -> what reaching it costs beyond its statements
+
+    def transpile_loop(self, loop:While) -> tuple[str, tuple]:
+        names = {}     # python name -> (slot, local)
+        def collect(node):
+            if isinstance(node, list):
+                for item in node:
+                    collect(item)
+                return
+            if isinstance(node, (Name, Declaration, Assignment)):
+                names[self.variable(node)] = (node.slot, node.local)
+                if not isinstance(node, Name):
+                    self.assigned.add(self.variable(node))
+            if isinstance(node, If) and node.orelse:
+                self.entry_costs[id(node.body)] = (1, 0) # the JUMP over the else block
+            for name in node.__slots__:
+                if isinstance(getattr(node, name), (Node, list)):
+                    collect(getattr(node, name))
+        collect([loop.condition] + loop.body)
+        def place(name):
+            slot, local = names[name]
+            return f"{'frame' if local else 'slots'}[{slot}]"
+        # an iteration runs the condition, its JUMP_IF_FALSE and the JUMP_BACK
+        steps, calls = self.costs[loop]
+        self.entry_costs[id(loop.body)] = (steps + 1, calls)
+        self.lines = ["def fission_loop(slots, frame, budget, out, usage):"]
+        self.lines += [f"    {name} = {place(name)}" for name in sorted(names)]
+        self.lines += ["    count = steps = calls = 0", "    try:", f"        while {self.expr(loop.condition)}:"]
+        self.block(loop.body, 3)
+        self.lines += ["            count += 1", "            if count == budget:", "                return False, count",
+                       f"        steps += {steps}"]
+        if calls:
+            self.lines.append(f"        calls += {calls}")
+        self.lines += ["        return True, count", "    finally:"]
+        self.lines += [f"        {place(name)} = {name}" for name in sorted(self.assigned)]
+        self.lines += ["        usage.steps += steps", "        usage.builtin_calls += calls", "        usage.iterations += count"]
+        return "\n".join(self.lines) + "\n", tuple(sorted(self.guards))
+
+    def block(self, body:list[Node], depth:int):
+        steps, calls = self.entry_costs.get(id(body), (0, 0))
+        for node in body:
+            if not isinstance(node, Block): # a Block's statements are counted by its own block()
+                steps += self.costs[node][0]
+                calls += self.costs[node][1]
+        if steps:
+            self.lines.append(f"{'    ' * depth}steps += {steps}")
+        if calls:
+            self.lines.append(f"{'    ' * depth}calls += {calls}")
+        super().block(body, depth)
+
+    def expr(self, node:Node) -> str:
+        if isinstance(node, BinaryOp):
+            left = self.expr(node.left)
+            right = self.expr(node.right)
+            if self.numeric(node.left, node.operands[0]) and self.numeric(node.right, node.operands[1]):
+                return f"({left} {PYTHON_OPERATORS[node.op]} {right})"
+            return f"apply_operator({node.op!r}, {left}, {right})"
+        if isinstance(node, Call) and node.name == "print" and BUILTINS["print"].function is fission_print:
+            # out is the running VM's Output, unless print has been replaced
+            return f"out.print({', '.join(self.expr(arg) for arg in node.args)})"
+        return super().expr(node)
+
+    def numeric(self, node:Node, type:str | None) -> bool:
+        if type in NUMERIC_TYPES:
+            return True
+        if type is None and isinstance(node, Name) and self.variable(node) not in self.assigned:
+            self.guards.add((node.slot, node.local))
+            return True
+        return False
+
+def python_namespace() -> dict:
+    # the helpers plus every builtin registered so far
+    namespace = dict(PYTHON_HELPERS)
+    namespace.update({f"fission_{name}": builtin.function for name, builtin in BUILTINS.items()})
+    return namespace
+
+def run_python(source:str | Error):
+    if isinstance(source, Error):
+        return source
+    namespace = python_namespace()
+    try:
+        exec(builtins.compile(source, "<fission>", "exec"), namespace)
+        namespace["fission_main"]()
+    except Error as error:
+        return error
+    except ZeroDivisionError:
+        return Error("DivisionWithZeroError","Cannot do division with 0")
+    except RecursionError:
+        return Error("RecursionError","Calls nested too deep")
+    except TypeError:
+        return Error("SyntaxError"," Syntax")
+    finally:
+        output.flush()
+    return None
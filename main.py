@@ -1,11 +1,30 @@
 import fission
 import sys
 
+# flags: -l print tokens, -p print AST, -c run on the bytecode VM, -d print bytecode,
+#        -f use the fast (regex, array-backed) lexer, -n don't use the .fissc cache with -c,
+#        -t run by translating to Python, -s print the generated Python,
+#        -o run the optimizer (constant folding, dead branches, loop hoisting) with -c/-t,
+#        -r profile a file on the VM and print a per-line hot-spot table to stderr,
+#        -e stream a file: run each statement as soon as it has been read
+# options: --profile-out=FILE also writes the profile as collapsed stacks for flamegraph tools,
+#          --mmap reads a streamed file through mmap,
+#          --buffer=CHARS sets how much output is collected before it is written (0 writes every print),
+#          --debug[=LEVEL] shows the tree-walker's variables and code blocks as they change,
+#          --max-steps=N, --max-seconds=S and --max-memory=BYTES stop a run that goes over them
+#          (the tree-walker only enforces --max-seconds),
+#          --usage prints what a VM run used (steps, loop iterations, builtin calls, ...) to stderr,
+#          --no-tier keeps hot loops on the VM instead of running them as Python
+# A file name of - reads the script from stdin, streamed.
 using_file = False
 curr = "i"
+options = {}
 running_file = ""
 for i, arg in enumerate(sys.argv[1:]):
-    if arg[0] == "-":
+    if arg.startswith("--"):
+        name, _, value = arg[2:].partition("=")
+        options[name] = value
+    elif arg[0] == "-" and arg != "-":
         if len(arg) == 1:
             print(f"Error, missing argument value. Invalid argument: {arg} argument number: {i} ")
         else:
@@ -13,21 +32,94 @@ for i, arg in enumerate(sys.argv[1:]):
     else:
         running_file = arg
         using_file = True
+if "buffer" in options:
+    fission.output.buffer_size = int(options["buffer"])
+if "debug" in options:
+    fission.output.debug_level = int(options["debug"] or 1)
+if "no-tier" in options:
+    fission.TIER_AFTER = None
+limits = fission.Limits(steps=int(options["max-steps"]) if "max-steps" in options else None,
+                        seconds=float(options["max-seconds"]) if "max-seconds" in options else None,
+                        memory=int(options["max-memory"]) if "max-memory" in options else None)
+
+def report_usage(vm):
+    if "usage" in options:
+        print(vm.usage,file=sys.stderr)
+
+def tokenize(text):
+    lex = fission.Lexer(text,fast="f" in curr)
+    lex.make_tokens()
+    return lex
+
+def token_lines(lex):
+    return lex.stream.lines() if lex.fast else lex.tokens
+
+def run_transpiled(lex):
+    source = fission.Transpiler("o" in curr).transpile(lex.stream if lex.fast else lex.tokens)
+    if "s" in curr and not isinstance(source, fission.Error):
+        print(source)
+    result = fission.run_python(source)
+    if result is not None:
+        print(result)
+
+def run_code(code):
+    if "d" in curr and not isinstance(code, fission.Error):
+        print(fission.disassemble(code))
+    vm = fission.VirtualMachine(limits=limits)
+    result = vm.run(code)
+    if result is not None:
+        print(result)
+    report_usage(vm)
 
 text = ""
 if using_file:
-    with open(running_file,'r') as f:
-        text = f.read()
-    lex = fission.Lexer(text)
-    lex.make_tokens()
-    ASTlines = []
-    for line in lex.tokens:
-        parser = fission.Parser(line)
-        parser.parse()
-        ASTlines.append(parser.AST + [fission.Token(fission.TT_NEWLINE,"")])
-    interpreter = fission.Interpreter()
-    print(interpreter.interpret(ASTlines))
+    if "e" in curr or running_file == "-":
+        # piped input runs statement by statement, files in groups of statements
+        group = 1 if running_file == "-" else 64
+        lines = fission.read_lines(running_file,use_mmap="mmap" in options)
+        session = fission.Session("o" in curr,redeclare=False,limits=limits)
+        result = fission.run_stream(lines,session,group)
+        if result is not None:
+            print(result)
+        report_usage(session.vm)
+    elif "r" in curr:
+        with open(running_file,'r') as f:
+            text = f.read()
+        profiler = fission.Profiler()
+        code = fission.compile_source(text,optimize="o" in curr,profile=True)
+        vm = fission.VirtualMachine(profiler,limits=limits)
+        result = vm.run(code)
+        if result is not None:
+            print(result)
+        report_usage(vm)
+        print(profiler.report(text),file=sys.stderr)
+        if "profile-out" in options:
+            with open(options["profile-out"],'w') as f:
+                f.write(profiler.collapsed())
+    elif "c" in curr:
+        # unchanged files load straight from __fisscache__ without lexing or parsing
+        run_code(fission.compile_file(running_file,use_cache="n" not in curr,optimize="o" in curr))
+    elif "t" in curr:
+        with open(running_file,'r') as f:
+            run_transpiled(tokenize(f.read()))
+    else:
+        with open(running_file,'r') as f:
+            text = f.read()
+        lex = tokenize(text)
+        ASTlines = []
+        for line in token_lines(lex):
+            parser = fission.Parser(line)
+            parser.parse()
+            ASTlines.append(parser.AST + [fission.Token(fission.TT_NEWLINE,"")])
+        interpreter = fission.Interpreter(limits)
+        result = interpreter.interpret(ASTlines)
+        fission.output.flush()
+        print(result)
 else:
+    # with -c the REPL keeps one session, so declarations carry over between inputs
+    session = fission.Session("o" in curr,limits=limits)
+    # the walker keeps its variables on the Interpreter, so one serves the whole REPL
+    interpreter = fission.Interpreter(limits)
     while True:
         text = input(">>> ")
         if text.lower() == "exit":
@@ -35,17 +127,31 @@ else:
         if text.count("{") > text.count("}"):
             while text.count("{") > text.count("}"):
                 text += "\n" + input("... ")
-        lex = fission.Lexer(text)
-        lex.make_tokens()
+        # -c alone goes straight to the session, which skips lexing a cached input
+        lex = tokenize(text) if "l" in curr or "c" not in curr else None
         if "l" in curr:
-            print(lex.tokens)
+            print(token_lines(lex))
+        if "c" in curr:
+            if "d" in curr:
+                code = session.compile(text)
+                if not isinstance(code, fission.Error):
+                    print(fission.disassemble(code))
+            result = session.run(text)
+            if result is not None:
+                print(result)
+            report_usage(session.vm)
+            continue
+        if "t" in curr:
+            run_transpiled(lex)
+            continue
         ASTlines = []
-        for line in lex.tokens:
+        for line in token_lines(lex):
             parser = fission.Parser(line)
             parser.parse()
             ASTlines.append(parser.AST + [fission.Token(fission.TT_NEWLINE,"")])
         if "p" in curr:
             print(*ASTlines,sep='\n')
         if "i" in curr:
-            interpreter = fission.Interpreter()
-            print(interpreter.interpret(ASTlines))
\ No newline at end of file
+            result = interpreter.interpret(ASTlines)
+            fission.output.flush()
+            print(result)
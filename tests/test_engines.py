@@ -0,0 +1,160 @@
+# The VM with and without hot loops tiered into Python, the optimizer and
+# the Python backend all have to agree: same output, and for the VM the
+# same usage counters. Run from the top of the repo with python -m pytest
+# tests or python -m unittest tests/test_engines.py.
+import io
+import unittest
+
+import fission
+from benchmarks.corpus import PROGRAMS
+
+SCRIPTS = {
+    "loops": """
+int i = 0
+float t = 0
+int k = 3
+while (i < 5000) {
+    t = t + i * k / 2
+    if (i > 2500) { t = t - 1 } else { t = t + len("ab") }
+    i = i + 1
+}
+print(t)
+""",
+    "prints": """
+int i = 0
+while (i < 3000) {
+    print(i, i * 2)
+    i = i + 1
+}
+""",
+    "arrays": """
+array a = [1, 2, 3, 4]
+array b = a * 2 + 1
+a[1] = 10
+print(a, b, sum(a), min(a), max(a), mean(a), a >= 3)
+int i = 0
+while (i < len(a)) {
+    a[i] = a[i] * a[i]
+    i = i + 1
+}
+print(a, range(5) / 2, zeros(3))
+""",
+    "strings": """
+string s = ""
+int i = 0
+while (i < 3000) {
+    s = s + "line " + asString(i) + " "
+    i = i + 1
+}
+print(len(s), s[0:6], find(s, "line 2999"), join(", ", "a", [1, 2]))
+string t = "hello, world"
+print(t[0], t[-1], t[:5], t[7:], "abc" < "abd")
+""",
+    "functions": """
+int total = 0
+int add(int a, int b) {
+    return a + b
+}
+pure int fib(int n) {
+    if (n < 2) {
+        return n
+    }
+    return fib(n - 1) + fib(n - 2)
+}
+int count(int n) {
+    int i = 0
+    while (i < n) {
+        total = add(total, i)
+        i = i + 1
+    }
+    return total
+}
+int series(int n) {
+    int i = 0
+    int t = 0
+    while (i < n) {
+        t = t + i
+        i = i + 1
+    }
+    return t
+}
+print(fib(40), count(3000), series(4000), total)
+""",
+    "errors": """
+int i = 0
+float z = 0
+while (i < 5000) {
+    print(i)
+    i = i + 1
+    if (i == 4000) { z = 1 / (i - i) }
+}
+""",
+}
+SCRIPTS.update((name, generate(200)[0]) for name, generate in PROGRAMS.items())
+
+COUNTERS = ("steps", "iterations", "builtin_calls", "function_calls", "peak_variables")
+
+def run_vm(source:str, optimize:bool=False, tier:bool=True) -> tuple[str, dict]:
+    sink = io.StringIO()
+    # small slices and a low threshold, so loops get tiered within a few iterations
+    vm = fission.VirtualMachine(stdout=fission.Output(sink), limits=fission.Limits(check_every=7))
+    vm.tier_after = 1 if tier else None
+    result = vm.run(fission.compile_source(source, optimize=optimize))
+    if result is not None:
+        sink.write(f"{result}\n")
+    return sink.getvalue(), {name: getattr(vm.usage, name) for name in COUNTERS}
+
+def run_python(source:str, optimize:bool=False) -> str:
+    sink = io.StringIO()
+    previous = fission.output.redirect(sink)
+    try:
+        result = fission.run_python(fission.Transpiler(optimize).transpile(fission.scan(source)))
+        fission.output.flush()
+    finally:
+        fission.output.redirect(previous)
+    if result is not None:
+        sink.write(f"{result}\n")
+    return sink.getvalue()
+
+class EngineTest(unittest.TestCase):
+    def test_tiering_changes_nothing(self):
+        for name, source in SCRIPTS.items():
+            with self.subTest(name):
+                tiered, usage = run_vm(source, tier=True)
+                expected, expected_usage = run_vm(source, tier=False)
+                self.assertEqual(tiered, expected)
+                if "Error" in expected:
+                    # a tiered loop is charged the whole block an error stopped it in
+                    del usage["steps"], expected_usage["steps"]
+                self.assertEqual(usage, expected_usage)
+
+    def test_optimizer_keeps_output(self):
+        for name, source in SCRIPTS.items():
+            with self.subTest(name):
+                self.assertEqual(run_vm(source, optimize=True)[0], run_vm(source)[0])
+
+    def test_python_backend(self):
+        for name, source in SCRIPTS.items():
+            with self.subTest(name):
+                expected = run_vm(source)[0]
+                self.assertEqual(run_python(source), expected)
+                self.assertEqual(run_python(source, optimize=True), expected)
+
+    def test_hot_loops_are_tiered(self):
+        code = fission.compile_source(SCRIPTS["loops"])
+        vm = fission.VirtualMachine(stdout=fission.Output(io.StringIO()), limits=fission.Limits(check_every=7))
+        vm.tier_after = 1
+        vm.run(code)
+        loops = [arg for op, arg in code.instructions if op == fission.LOOP_ENTRY]
+        self.assertEqual(len(loops), 1)
+        self.assertIsNotNone(loops[0].function)
+
+    def test_limits_stop_tiered_loops(self):
+        for tier in (True, False):
+            vm = fission.VirtualMachine(stdout=fission.Output(io.StringIO()), limits=fission.Limits(steps=5000))
+            vm.tier_after = 1 if tier else None
+            result = vm.run(fission.compile_source(SCRIPTS["prints"]))
+            self.assertEqual(result.title, "StepLimitError")
+
+if __name__ == "__main__":
+    unittest.main()